@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import os
 
 from extensions import mongo, bcrypt, jwt
+from models.indexes import ensure_indexes
 from routes.auth_routes import auth_bp
 from routes.admin_routes import admin_bp
 from routes.seller_routes import seller_bp
@@ -16,6 +17,7 @@ from routes.order import orders_bp
 from routes.recommendations import recommendation_bp
 from routes.chat import chat_bp
 from routes.cart_routes import cart_bp 
+from routes.stripe_webhook import webhook_bp
 
 load_dotenv()
 
@@ -33,7 +35,8 @@ CORS(
     app,
     resources={r"/api/*": {"origins": "*"}},
     supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+    expose_headers=["X-Next-Cursor", "ETag"],
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
 )
 
@@ -65,8 +68,20 @@ app.register_blueprint(orders_bp)
 app.register_blueprint(recommendation_bp, url_prefix="/api/recommendations")
 app.register_blueprint(chat_bp, url_prefix="/api/chat")
 # UPDATED: Cart Blueprint register kiya (Iska prefix /api/cart already route file mein set hai)
-app.register_blueprint(cart_bp) 
+app.register_blueprint(cart_bp)
+# Stripe webhook (/api/webhook/stripe): orders isi se paid hote hain
+app.register_blueprint(webhook_bp)
 
+# INDEXES: `python manage_indexes.py apply` deploy step mein chalao. Local dev ke liye
+# ENSURE_INDEXES_ON_STARTUP=1 se startup pe bhi ban jaate hain (isse Mongo connection
+# import time pe, gunicorn fork se pehle khulta hai - production mein off rakho).
+if os.getenv("ENSURE_INDEXES_ON_STARTUP", "0") == "1":
+    try:
+        with app.app_context():
+            for failure in ensure_indexes():
+                print(f"Index error on {failure['collection']}: {failure['error']}")
+    except Exception as e:
+        print(f"Index setup skipped: {e}")
 
 
 @app.route("/test-db")
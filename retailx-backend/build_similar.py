@@ -0,0 +1,160 @@
+"""Offline "similar products" job.
+
+Har product ke liye top-K similar products (same weighted TF-IDF content mix
+jo get_recommendations() use karta hai) compute karke product document ke
+`similar` field mein save karta hai. Request path pe phir sirf ek O(K) lookup
+hota hai.
+
+Usage:
+    python build_similar.py            # sirf last run ke baad badle products
+    python build_similar.py --full     # poora catalog dobara
+    python build_similar.py --top-k 12
+    python build_similar.py --ann      # catalog ka LSH (ANN) index bana ke disk pe save
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+from pymongo import UpdateOne
+from bson import ObjectId
+
+from cli_app import create_app
+from extensions import mongo
+from repositories.similarity_engine import similarity_rows, top_k_indices
+
+JOB_META_ID = "similar_job"
+DEFAULT_TOP_K = 12
+CHUNK_SIZE = 256  # itni rows ek baar mein multiply hoti hain (memory bounded)
+
+
+def iter_similarity_chunks(matrix, rows, matrix_t):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        yield chunk, similarity_rows(matrix, chunk, matrix_t)
+
+
+def top_k_neighbours(matrix, rows, ids, top_k, matrix_t):
+    table = {}
+    for chunk, sims in iter_similarity_chunks(matrix, rows, matrix_t):
+        for offset, r in enumerate(chunk):
+            row = sims[offset]
+            table[ids[r]] = [
+                {"id": ids[c], "score": round(float(row[c]), 4)}
+                for c in top_k_indices(row, top_k, exclude=[r])
+            ]
+    return table
+
+
+def find_affected_rows(matrix, ids, changed_rows, stored, top_k, matrix_t):
+    """Incremental refresh: badle hue products ke alawa wo products bhi
+    recompute karne hain jinki list mein koi badla/deleted product hai, ya
+    jinke liye koi badla product ab unki list mein aane layak hai."""
+    active = set(ids)
+    changed_ids = {ids[r] for r in changed_rows}
+    affected = set(changed_rows)
+
+    for j, pid in enumerate(ids):
+        neighbours = stored.get(pid)
+        if neighbours is None:
+            affected.add(j)
+            continue
+        if any(n["id"] not in active or n["id"] in changed_ids for n in neighbours):
+            affected.add(j)
+
+    # Har product ki list ka sabse chhota score (list poori na ho toh 0)
+    floors = np.zeros(len(ids))
+    for j, pid in enumerate(ids):
+        neighbours = stored.get(pid) or []
+        if len(neighbours) >= top_k:
+            floors[j] = neighbours[-1]["score"]
+
+    # Similarity symmetric hai: changed rows ka chunk har product ka column bhi deta hai
+    for chunk, sims in iter_similarity_chunks(matrix, changed_rows, matrix_t):
+        sims[np.arange(len(chunk)), chunk] = -1.0
+        affected.update(np.nonzero(sims.max(axis=0) > floors)[0].tolist())
+
+    return sorted(affected)
+
+
+def run(full=False, top_k=DEFAULT_TOP_K):
+    # Import yahan isliye ki mongo.init_app pehle ho chuka ho
+    from repositories.recommendation_repository import build_recommendation_model
+
+    started_at = datetime.utcnow()
+    meta = mongo.db.meta.find_one({"_id": JOB_META_ID}) or {}
+    last_run = meta.get("lastRunAt")
+
+    model = build_recommendation_model()
+    matrix = model["matrix"]
+    matrix_t = model["matrix_t"]
+    ids = [p["id"] for p in model["products"]]
+    if matrix is None or not ids:
+        print("Catalog khali hai, kuch compute nahi kiya")
+        return 0
+
+    if full or not last_run or meta.get("topK") != top_k:
+        rows = list(range(len(ids)))
+    else:
+        changed = mongo.db.products.find(
+            {"isActive": True, "$or": [
+                {"updatedAt": {"$gte": last_run}},
+                {"createdAt": {"$gte": last_run}}
+            ]},
+            {"_id": 1}
+        )
+        changed_rows = [model["index"][str(p["_id"])] for p in changed if str(p["_id"]) in model["index"]]
+        stored = {
+            str(p["_id"]): p.get("similar")
+            for p in mongo.db.products.find({"isActive": True}, {"similar": 1})
+        }
+        rows = find_affected_rows(matrix, ids, changed_rows, stored, top_k, matrix_t)
+
+    table = top_k_neighbours(matrix, rows, ids, top_k, matrix_t)
+    ops = [
+        UpdateOne({"_id": ObjectId(pid)}, {"$set": {"similar": neighbours, "similarUpdatedAt": started_at}})
+        for pid, neighbours in table.items()
+    ]
+    for start in range(0, len(ops), 1000):
+        mongo.db.products.bulk_write(ops[start:start + 1000], ordered=False)
+
+    mongo.db.meta.update_one(
+        {"_id": JOB_META_ID},
+        {"$set": {"lastRunAt": started_at, "topK": top_k, "catalogVersion": model["version"]}},
+        upsert=True
+    )
+    print(f"✅ {len(ops)} / {len(ids)} products ke similar items update hue")
+    return len(ops)
+
+
+def build_ann(n_tables, n_bits):
+    from repositories.products_repository import get_all_products
+    from repositories.recommendation_repository import build_content
+    from repositories.ann_index import build_ann_index, index_file_lock, ANN_INDEX_PATH
+
+    products = get_all_products()
+    if not products:
+        print("Catalog khali hai, ANN index nahi bana")
+        return None
+    index = build_ann_index(products, build_content, n_tables, n_bits)
+    # Running workers ka sync beech mein purana index na likh de
+    with index_file_lock(ANN_INDEX_PATH):
+        index.save(ANN_INDEX_PATH)
+    print(f"✅ ANN index ({len(index)} products, {n_tables} tables x {n_bits} bits) -> {ANN_INDEX_PATH}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-K similar products")
+    parser.add_argument("--full", action="store_true", help="poora catalog recompute karo")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--ann", action="store_true", help="neighbour table ki jagah ANN index banao")
+    parser.add_argument("--tables", type=int, default=None, help="ANN hash tables (recall)")
+    parser.add_argument("--bits", type=int, default=None, help="ANN bits per table (bucket size)")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        if args.ann:
+            from repositories.ann_index import DEFAULT_TABLES, DEFAULT_BITS
+            build_ann(args.tables or DEFAULT_TABLES, args.bits or DEFAULT_BITS)
+        else:
+            run(full=args.full, top_k=args.top_k)
@@ -0,0 +1,18 @@
+"""CLI jobs (build_similar, manage_indexes, reconcile_*) ke liye minimal Flask app.
+
+Sirf Mongo configure hota hai - routes, JWT ya ML libraries load nahi hoti.
+"""
+import os
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from extensions import mongo
+
+
+def create_app():
+    load_dotenv()
+    app = Flask(__name__)
+    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+    mongo.init_app(app)
+    return app
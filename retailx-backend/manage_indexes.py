@@ -0,0 +1,38 @@
+"""MongoDB indexes ka CLI (models/indexes.py mein declared).
+
+Usage:
+    python manage_indexes.py apply    # saare indexes banao + categoryKey backfill
+    python manage_indexes.py check    # har query shape ka explain(); COLLSCAN mile toh exit 1
+"""
+import argparse
+import sys
+
+from cli_app import create_app
+from models.indexes import ensure_indexes, check_query_plans
+
+
+def apply():
+    failures = ensure_indexes()
+    for f in failures:
+        print(f"Index failed on {f['collection']} {f['keys']}: {f['error']}")
+    print("Indexes applied" if not failures else f"{len(failures)} index(es) failed")
+    return not failures
+
+
+def check():
+    ok, report = check_query_plans()
+    for r in report:
+        status = "OK  " if r["indexed"] else "SCAN"
+        print(f"{status} {r['name']}: {', '.join(r['stages'])}")
+    print("All query shapes use an index" if ok else "Some query shapes need a COLLSCAN")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or verify MongoDB indexes")
+    parser.add_argument("command", choices=["apply", "check"])
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        ok = apply() if args.command == "apply" else check()
+    sys.exit(0 if ok else 1)
@@ -1,6 +1,187 @@
 from extensions import mongo
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+DEFAULT_BUDGET = 2000
+
+# --- ATOMIC CART WRITES ---
+# Har mutation ek hi find_one_and_update hai (pipeline update + upsert): cart
+# na ho toh ban jaata hai, items merge hote hain aur budget check MongoDB ke
+# andar usi atomic step mein hota hai. Isliye do tabs se parallel adds ek
+# doosre ka update nahi khaate. Budget cross ho toh pipeline cart ko waisa hi
+# chhod deta hai; `lastOpId` marker se pata chalta hai ki write laga ya nahi.
+# Response ke liye post-image hi use hota hai (dobara find nahi).
+#
+# Totals (spent, remaining, itemCount) cart document pe hi maintained hain aur
+# usi write mein delta se update hote hain, isliye budget check aur GET ko items
+# ka sum nahi karna padta. reconcile_carts.py drift pakad ke theek karta hai.
+
+CART_PROJECTION = {"items": 1, "monthlyBudget": 1, "spent": 1, "remaining": 1, "itemCount": 1}
+
+
+def _lit(value):
+    # Client values ("$..." wale strings bhi) expression na ban jaayein
+    return {"$literal": value}
+
+
+def _spent_expr(items_expr):
+    """Items se spent ka poora sum (sirf legacy carts aur reconciliation ke liye)."""
+    return {"$round": [{"$sum": {"$map": {"input": items_expr, "as": "line", "in": {"$multiply": [
+        {"$ifNull": ["$$line.price", 0]}, {"$ifNull": ["$$line.quantity", 0]}
+    ]}}}}, 2]}
+
+
+def _count_expr(items_expr):
+    return {"$sum": {"$map": {"input": items_expr, "as": "line", "in": {"$ifNull": ["$$line.quantity", 0]}}}}
+
+
+def _map_line(product_id, new_line_expr, items_expr="$items"):
+    """Matching productId wali line ko new_line_expr ($$item context) se badlo."""
+    return {"$map": {"input": items_expr, "as": "item", "in": {"$cond": [
+        {"$eq": ["$$item.productId", _lit(product_id)]}, new_line_expr, "$$item"
+    ]}}}
+
+
+def _line_expr(product_id):
+    """Cart mein product ki existing line (na ho toh missing)."""
+    return {"$arrayElemAt": [{"$filter": {
+        "input": "$items", "as": "item", "cond": {"$eq": ["$$item.productId", _lit(product_id)]}
+    }}, 0]}
+
+
+# Item-list transforms (input koi bhi items expression, taaki bulk mein chain ho sakein)
+def _add_line(line, items_expr="$items", keep_max=False):
+    """Line ho toh quantity badhao (ya keep_max pe dono ka max), warna nayi line jodo."""
+    combine = "$max" if keep_max else "$add"
+    quantity = {combine: ["$$item.quantity", line["quantity"]]}
+    return {"$cond": [
+        {"$in": [_lit(line["productId"]), {"$ifNull": [items_expr + ".productId", []]}]},
+        _map_line(line["productId"], {"$mergeObjects": ["$$item", {"quantity": quantity}]}, items_expr),
+        {"$concatArrays": [items_expr, _lit([line])]}
+    ]}
+
+
+def _set_quantity(product_id, quantity, items_expr="$items"):
+    return _map_line(product_id, {"$mergeObjects": ["$$item", {"quantity": quantity}]}, items_expr)
+
+
+def _remove_line(product_id, items_expr="$items"):
+    return {"$filter": {
+        "input": items_expr, "as": "item", "cond": {"$ne": ["$$item.productId", _lit(product_id)]}
+    }}
+
+
+def line_price(price):
+    """Line price exact paise mein (finalPrice 874.125 jaise 3 decimals ho sakte hain).
+    Tabhi har write ka delta aur reconcile ka $round(sum) same total dete hain."""
+    return round(float(price or 0), 2)
+
+
+def cart_line(data):
+    """Client payload se cart line (validation caller karta hai)."""
+    return {
+        "productId": str(data.get("productId")),
+        "name": data.get("name"),
+        "price": line_price(data.get("price")),
+        "imageURL": data.get("imageURL"),
+        "brand": data.get("brand"),
+        "category": data.get("category"),
+        "quantity": int(data.get("quantity", 1))
+    }
+
+
+HAS_LINE = {"$ne": [{"$type": "$_line"}, "missing"]}
+LINE_QTY = {"$ifNull": ["$_line.quantity", 0]}
+LINE_PRICE = {"$ifNull": ["$_line.price", 0]}
+
+
+def _guarded_pipeline(change, op_id, now):
+    """`change` = {"items": naye items, "spent": naya spent, "itemCount": naya count}
+    (expressions, "$spent"/"$itemCount" purane maintained values hain) aur optional
+    "stages" (helper fields jaise _line ke $set stages). Naye items tabhi lagte hain jab spent
+    budget ke andar ho, ya kam ho raha ho (remove / quantity ghatana hamesha allowed)."""
+    stages = [
+        {"$set": {
+            "items": {"$ifNull": ["$items", []]},
+            "monthlyBudget": {"$ifNull": ["$monthlyBudget", DEFAULT_BUDGET]},
+            "createdAt": {"$ifNull": ["$createdAt", now]},
+            "updatedAt": {"$ifNull": ["$updatedAt", now]}
+        }},
+        # Purane carts (totals se pehle wale) ke liye ek baar sum
+        {"$set": {
+            "spent": {"$ifNull": ["$spent", _spent_expr("$items")]},
+            "itemCount": {"$ifNull": ["$itemCount", _count_expr("$items")]}
+        }}
+    ]
+    stages += change.get("stages", [])
+    stages += [
+        {"$set": {
+            "_next": change["items"],
+            "_spent": {"$round": [change["spent"], 2]},
+            "_count": change["itemCount"]
+        }},
+        {"$set": {"_ok": {"$or": [
+            {"$lte": ["$_spent", "$monthlyBudget"]},
+            {"$lte": ["$_spent", "$spent"]}
+        ]}}},
+        {"$set": {
+            "items": {"$cond": ["$_ok", "$_next", "$items"]},
+            "spent": {"$cond": ["$_ok", "$_spent", "$spent"]},
+            "itemCount": {"$cond": ["$_ok", "$_count", "$itemCount"]},
+            "remaining": {"$subtract": ["$monthlyBudget", {"$cond": ["$_ok", "$_spent", "$spent"]}]},
+            "updatedAt": {"$cond": ["$_ok", now, "$updatedAt"]},
+            "lastOpId": {"$cond": ["$_ok", op_id, {"$ifNull": ["$lastOpId", None]}]}
+        }},
+        {"$unset": ["_next", "_spent", "_count", "_ok", "_line", "_work"]}
+    ]
+    return stages
+
+
+CHECKOUT_PRODUCT_FIELDS = {"finalPrice": 1, "stock": 1, "isActive": 1, "name": 1}
+
+
+def revalidate_lines(items):
+    """Lines ko products collection se ek $in query mein check karo.
+    Return: (corrected items, issues). Band/missing/out-of-stock lines hat jaati hain,
+    stock se zyada quantity stock tak aati hai, price finalPrice ho jaata hai."""
+    ids = {str(item.get("productId")) for item in items}
+    object_ids = [ObjectId(pid) for pid in ids if ObjectId.is_valid(pid)]
+    products = {
+        str(p["_id"]): p
+        for p in mongo.db.products.find({"_id": {"$in": object_ids}}, CHECKOUT_PRODUCT_FIELDS)
+    } if object_ids else {}
+
+    corrected, issues = [], []
+    for item in items:
+        product_id = str(item.get("productId"))
+        product = products.get(product_id)
+        if not product or not product.get("isActive", True):
+            issues.append({"productId": product_id, "issue": "unavailable"})
+            continue
+
+        stock = product.get("stock", 0) or 0
+        if stock <= 0:
+            issues.append({"productId": product_id, "issue": "out_of_stock"})
+            continue
+
+        line = dict(item)
+        if line.get("quantity", 0) > stock:
+            issues.append({"productId": product_id, "issue": "insufficient_stock",
+                           "requested": line.get("quantity"), "available": stock})
+            line["quantity"] = stock
+
+        price = product.get("finalPrice")
+        if price is not None:
+            price = line_price(price)
+        if price is not None and price != line.get("price"):
+            issues.append({"productId": product_id, "issue": "price_changed",
+                           "oldPrice": line.get("price"), "newPrice": price})
+            line["price"] = price
+        corrected.append(line)
+    return corrected, issues
+
 
 class Cart:
     @staticmethod
@@ -8,78 +189,206 @@ class Cart:
         return mongo.db.carts.find_one({"userId": ObjectId(user_id)})
 
     @staticmethod
-    def create_cart(user_id, monthly_budget=2000):
+    def get_or_create(user_id):
+        """Ek projected read; cart na ho tabhi upsert (totals ke saath)."""
+        cart = mongo.db.carts.find_one({"userId": ObjectId(user_id)}, CART_PROJECTION)
+        if cart is not None:
+            return cart
+        now = datetime.utcnow()
+        return Cart._write(user_id, {"$setOnInsert": {
+            "items": [], "monthlyBudget": DEFAULT_BUDGET, "spent": 0, "remaining": DEFAULT_BUDGET,
+            "itemCount": 0, "createdAt": now, "updatedAt": now
+        }})
+
+    @staticmethod
+    def create_cart(user_id, monthly_budget=DEFAULT_BUDGET):
         return mongo.db.carts.insert_one({
             "userId": ObjectId(user_id),
             "items": [],
             "monthlyBudget": monthly_budget,
+            "spent": 0,
+            "remaining": monthly_budget,
+            "itemCount": 0,
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         })
 
+    @staticmethod
+    def _write(user_id, update):
+        query = {"userId": ObjectId(user_id)}
+        try:
+            return mongo.db.carts.find_one_and_update(
+                query, update, projection=dict(CART_PROJECTION, lastOpId=1),
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Do parallel upserts mein se ek hi insert hota hai; dusra ab update karega
+            return mongo.db.carts.find_one_and_update(
+                query, update, projection=dict(CART_PROJECTION, lastOpId=1), return_document=ReturnDocument.AFTER
+            )
+
+    @staticmethod
+    def _apply(user_id, change):
+        """Return (cart post-image, applied)"""
+        op_id = str(ObjectId())
+        cart = Cart._write(user_id, _guarded_pipeline(change, op_id, datetime.utcnow()))
+        return cart, cart.get("lastOpId") == op_id
+
     @staticmethod
     def clear_cart(user_id):
         """Payment ke baad cart ko khali karne ke liye"""
-        return mongo.db.carts.update_one(
-            {"userId": ObjectId(user_id)},
-            {
-                "$set": {
-                    "items": [], 
-                    "updatedAt": datetime.utcnow()
-                }
-            }
-        )
+        return Cart._apply(user_id, {"items": _lit([]), "spent": 0, "itemCount": 0})
 
     @staticmethod
     def add_item(user_id, product_data):
-        cart = Cart.find_by_user(user_id)
-        if not cart:
-            Cart.create_cart(user_id)
-            cart = Cart.find_by_user(user_id)
-
-        product_id = product_data.get("productId")
-        price = product_data.get("price")
-        quantity = product_data.get("quantity", 1)
-
-        # Budget Check
-        current_spent = sum(item["price"] * item["quantity"] for item in cart.get("items", []))
-        budget_limit = cart.get("monthlyBudget", 2000)
-
-        if current_spent + (price * quantity) > budget_limit:
-            return {"error": f"Budget Full! Limit: ₹{budget_limit}"}, 400
-
-        # Update existing or add new
-        found = False
-        items = cart.get("items", [])
-        for item in items:
-            if item["productId"] == product_id:
-                item["quantity"] += quantity
-                found = True
-                break
-        
-        if not found:
-            items.append({
-                "productId": product_id,
-                "name": product_data.get("name"),
-                "price": price,
-                "imageURL": product_data.get("imageURL"),
-                "brand": product_data.get("brand"),
-                "category": product_data.get("category"),
-                "quantity": quantity
-            })
-
-        mongo.db.carts.update_one(
-            {"userId": ObjectId(user_id)},
-            {"$set": {"items": items, "updatedAt": datetime.utcnow()}}
-        )
-        return {"message": "Item added successfully"}, 200
+        """Return (cart, applied) - applied False matlab budget full."""
+        line = cart_line(product_data)
+        # Line pehle se ho toh quantity usi ki (purani) price pe badhti hai
+        price = {"$cond": [HAS_LINE, LINE_PRICE, line["price"]]}
+        return Cart._apply(user_id, {
+            "stages": [{"$set": {"_line": _line_expr(line["productId"])}}],
+            "items": _add_line(line),
+            "spent": {"$add": ["$spent", {"$multiply": [price, line["quantity"]]}]},
+            "itemCount": {"$add": ["$itemCount", line["quantity"]]}
+        })
+
+    @staticmethod
+    def update_quantity(user_id, product_id, quantity):
+        quantity = int(quantity)
+        next_qty = {"$cond": [HAS_LINE, quantity, 0]}  # line hi nahi toh kuch nahi badalta
+        return Cart._apply(user_id, {
+            "stages": [{"$set": {"_line": _line_expr(str(product_id))}}],
+            "items": _set_quantity(str(product_id), quantity),
+            "spent": {"$add": ["$spent", {"$multiply": [{"$subtract": [next_qty, LINE_QTY]}, LINE_PRICE]}]},
+            "itemCount": {"$add": ["$itemCount", {"$subtract": [next_qty, LINE_QTY]}]}
+        })
 
     @staticmethod
     def remove_item(user_id, product_id):
-        return mongo.db.carts.update_one(
-            {"userId": ObjectId(user_id)},
-            {"$pull": {"items": {"productId": product_id}}, 
-             "$set": {"updatedAt": datetime.utcnow()}}
-        )
+        return Cart._apply(user_id, {
+            "stages": [{"$set": {"_line": _line_expr(str(product_id))}}],
+            "items": _remove_line(str(product_id)),
+            "spent": {"$subtract": ["$spent", {"$multiply": [LINE_QTY, LINE_PRICE]}]},
+            "itemCount": {"$subtract": ["$itemCount", LINE_QTY]}
+        })
+
+    @staticmethod
+    def apply_bulk(user_id, operations):
+        """Kai add / update / remove / merge ek hi pipeline write mein, order mein.
+        Budget poore batch ke final total pe check hota hai: ya sab lagta hai ya kuch nahi.
+        `operations` validated hone chahiye: [{"op", "productId", "quantity", ...line fields}]"""
+        stages = [{"$set": {"_work": "$items"}}]
+        for operation in operations:
+            product_id = str(operation["productId"])
+            if operation["op"] in ("add", "merge"):
+                work = _add_line(cart_line(operation), "$_work", keep_max=operation["op"] == "merge")
+            elif operation["op"] == "update":
+                work = _set_quantity(product_id, int(operation["quantity"]), "$_work")
+            else:
+                work = _remove_line(product_id, "$_work")
+            stages.append({"$set": {"_work": work}})
 
-    
\ No newline at end of file
+        return Cart._apply(user_id, {
+            "stages": stages,
+            "items": "$_work",
+            "spent": _spent_expr("$_work"),
+            "itemCount": _count_expr("$_work")
+        })
+
+    @staticmethod
+    def update_budget(user_id, monthly_budget):
+        now = datetime.utcnow()
+        monthly_budget = float(monthly_budget)
+        return Cart._write(user_id, [
+            {"$set": {
+                "items": {"$ifNull": ["$items", []]},
+                "createdAt": {"$ifNull": ["$createdAt", now]}
+            }},
+            {"$set": {
+                "spent": {"$ifNull": ["$spent", _spent_expr("$items")]},
+                "itemCount": {"$ifNull": ["$itemCount", _count_expr("$items")]}
+            }},
+            {"$set": {
+                "monthlyBudget": monthly_budget,
+                "remaining": {"$subtract": [monthly_budget, "$spent"]},
+                "updatedAt": now
+            }}
+        ])
+
+    @staticmethod
+    def totals(cart):
+        """Maintained fields se response totals (legacy cart ho toh items se)."""
+        budget = cart.get("monthlyBudget", DEFAULT_BUDGET)
+        spent = cart.get("spent")
+        if spent is None:
+            spent = round(sum((i.get("price") or 0) * (i.get("quantity") or 0) for i in cart.get("items", [])), 2)
+        item_count = cart.get("itemCount")
+        if item_count is None:
+            item_count = sum(i.get("quantity") or 0 for i in cart.get("items", []))
+        return {
+            "spent": spent,
+            "remaining": budget - spent,
+            "itemCount": item_count,
+            "percentUsed": round(spent / budget * 100, 2) if budget else 0
+        }
+
+    # --- CHECKOUT VALIDATION ---
+    @staticmethod
+    def validate_for_checkout(user_id, attempts=3):
+        """Cart lines ko products ke current finalPrice / stock / isActive se
+        milao (ek $in query), aur corrected cart wapas likho.
+        Return: (corrected cart, issues)"""
+        for _ in range(attempts):
+            cart = mongo.db.carts.find_one(
+                {"userId": ObjectId(user_id)}, dict(CART_PROJECTION, updatedAt=1)
+            ) or Cart.get_or_create(user_id)
+            items, issues = revalidate_lines(cart.get("items", []))
+
+            spent = round(sum(item["price"] * item["quantity"] for item in items), 2)
+            totals = {
+                "items": items,
+                "spent": spent,
+                "itemCount": sum(item["quantity"] for item in items),
+                "remaining": cart.get("monthlyBudget", DEFAULT_BUDGET) - spent
+            }
+            if not issues and all(cart.get(k) == v for k, v in totals.items()):
+                return cart, issues
+
+            # Beech mein cart badla ho toh (updatedAt match nahi) dobara padho
+            updated = mongo.db.carts.find_one_and_update(
+                {"userId": ObjectId(user_id), "updatedAt": cart.get("updatedAt")},
+                {"$set": dict(totals, updatedAt=datetime.utcnow())},
+                projection=CART_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            if updated is not None:
+                return updated, issues
+        return cart, issues
+
+    # --- RECONCILIATION ---
+    @staticmethod
+    def drift_filter():
+        """Carts jinke maintained totals items se match nahi karte."""
+        spent = _spent_expr("$items")
+        return {"$expr": {"$or": [
+            {"$ne": ["$spent", spent]},
+            {"$ne": ["$itemCount", _count_expr("$items")]},
+            {"$ne": ["$remaining", {"$subtract": ["$monthlyBudget", spent]}]}
+        ]}}
+
+    @staticmethod
+    def count_drifted():
+        return mongo.db.carts.count_documents(Cart.drift_filter())
+
+    @staticmethod
+    def reconcile_totals():
+        """Drifted carts ke totals items se dobara likho (ek server-side update_many)."""
+        result = mongo.db.carts.update_many(Cart.drift_filter(), [
+            {"$set": {
+                "items": {"$ifNull": ["$items", []]},
+                "monthlyBudget": {"$ifNull": ["$monthlyBudget", DEFAULT_BUDGET]}
+            }},
+            {"$set": {"spent": _spent_expr("$items"), "itemCount": _count_expr("$items")}},
+            {"$set": {"remaining": {"$subtract": ["$monthlyBudget", "$spent"]}}}
+        ])
+        return result.modified_count
@@ -0,0 +1,156 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import PyMongoError, ConnectionFailure
+from extensions import mongo
+
+# --- INDEX MANAGER ---
+# App ki har hot query ke liye index yahin declare hota hai. ensure_indexes()
+# idempotent hai (startup pe ya `python manage_indexes.py apply` se chalao).
+# check_query_plans() har repository query shape ko explain() karke dekhta hai
+# ki koi COLLSCAN toh nahi ho raha.
+
+SEARCH_INDEX_NAME = "product_text_search"
+SEARCH_WEIGHTS = {"name": 10, "brand": 6, "tags": 5, "subCategory": 3, "category": 3}
+
+INDEXES = {
+    "products": [
+        # Listing sorts (pagination.SORT_OPTIONS): newest / price / rating
+        {"keys": [("isActive", ASCENDING), ("_id", DESCENDING)]},
+        {"keys": [("isActive", ASCENDING), ("finalPrice", ASCENDING), ("_id", ASCENDING)]},
+        {"keys": [("isActive", ASCENDING), ("rating", DESCENDING), ("_id", DESCENDING)]},
+        # Category pages (categoryKey = lowercase category, regex ki zarurat nahi)
+        {"keys": [("isActive", ASCENDING), ("categoryKey", ASCENDING), ("_id", DESCENDING)]},
+        {"keys": [("isActive", ASCENDING), ("categoryKey", ASCENDING), ("finalPrice", ASCENDING), ("_id", ASCENDING)]},
+        {"keys": [("isActive", ASCENDING), ("categoryKey", ASCENDING), ("rating", DESCENDING), ("_id", DESCENDING)]},
+        # Seller inventory
+        {"keys": [("seller_email", ASCENDING), ("_id", DESCENDING)]},
+        # build_similar.py incremental refresh
+        {"keys": [("updatedAt", ASCENDING)]},
+        {"keys": [("createdAt", ASCENDING)]},
+        # Search
+        {
+            "keys": [(field, TEXT) for field in SEARCH_WEIGHTS],
+            "name": SEARCH_INDEX_NAME,
+            "weights": SEARCH_WEIGHTS,
+            "default_language": "english",
+        },
+    ],
+    "orders": [
+        # Webhook ingestion idempotent rahe: ek payment / checkout session = ek order.
+        # Partial isliye ki purane orders (bina session_id) index se bahar rahein.
+        {"keys": [("payment_id", ASCENDING)], "name": "payment_id_unique", "unique": True,
+         "partialFilterExpression": {"payment_id": {"$exists": True}}},
+        {"keys": [("session_id", ASCENDING)], "name": "session_id_unique", "unique": True,
+         "partialFilterExpression": {"session_id": {"$exists": True}}},
+        # reconcile_orders.py: atke hue pending / unfinalized orders
+        {"keys": [("status", ASCENDING), ("created_at", ASCENDING)]},
+        {"keys": [("email", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "carts": [
+        {"keys": [("userId", ASCENDING)], "unique": True},
+    ],
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+    ],
+    "sellers": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+    ],
+    "admins": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+    ],
+}
+
+# Repositories / routes jo queries chalate hain unke shapes (explain check ke liye)
+QUERY_SHAPES = [
+    {"name": "products.listing.newest", "collection": "products",
+     "filter": {"isActive": True}, "sort": [("_id", DESCENDING)]},
+    {"name": "products.listing.price", "collection": "products",
+     "filter": {"isActive": True}, "sort": [("finalPrice", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "products.listing.rating", "collection": "products",
+     "filter": {"isActive": True}, "sort": [("rating", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "products.category", "collection": "products",
+     "filter": {"isActive": True, "categoryKey": "footwear"}, "sort": [("_id", DESCENDING)]},
+    {"name": "products.category.price", "collection": "products",
+     "filter": {"isActive": True, "categoryKey": "footwear"}, "sort": [("finalPrice", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "products.category.rating", "collection": "products",
+     "filter": {"isActive": True, "categoryKey": "footwear"}, "sort": [("rating", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "products.search", "collection": "products",
+     "filter": {"$text": {"$search": "shoes"}, "isActive": True}},
+    {"name": "products.seller_inventory", "collection": "products",
+     "filter": {"seller_email": "seller@example.com"}, "sort": [("_id", DESCENDING)]},
+    {"name": "products.changed_since", "collection": "products",
+     "filter": {"isActive": True, "$or": [{"updatedAt": {"$gte": datetime(2000, 1, 1)}},
+                                          {"createdAt": {"$gte": datetime(2000, 1, 1)}}]}},
+    {"name": "orders.by_payment", "collection": "orders", "filter": {"payment_id": "pi_x"}},
+    {"name": "orders.by_session", "collection": "orders", "filter": {"session_id": "cs_x"}},
+    {"name": "orders.stale_pending", "collection": "orders",
+     "filter": {"status": "pending", "created_at": {"$lt": datetime(2000, 1, 1)}}},
+    {"name": "orders.by_user", "collection": "orders",
+     "filter": {"email": "user@example.com"}, "sort": [("created_at", DESCENDING)]},
+    {"name": "carts.by_user", "collection": "carts", "filter": {"userId": ObjectId("000000000000000000000000")}},
+    {"name": "users.by_email", "collection": "users", "filter": {"email": "user@example.com"}},
+    {"name": "sellers.by_email", "collection": "sellers", "filter": {"email": "seller@example.com"}},
+    {"name": "admins.by_email", "collection": "admins", "filter": {"email": "admin@example.com"}},
+]
+
+
+def category_key(category):
+    return str(category or "").strip().lower()
+
+
+def backfill_category_keys():
+    """Purane products jinke paas categoryKey nahi hai (ek server-side update)."""
+    result = mongo.db.products.update_many(
+        {"categoryKey": {"$exists": False}},
+        [{"$set": {"categoryKey": {"$toLower": {"$trim": {"input": {"$ifNull": ["$category", ""]}}}}}}]
+    )
+    return result.modified_count
+
+
+def ensure_indexes():
+    """Saare declared indexes banao. Jo fail ho (jaise duplicate data pe unique)
+    unki list return hoti hai, baaki phir bhi ban jaate hain. Mongo hi unreachable
+    ho toh pehli failure pe ruk jaata hai (har spec pe server-selection timeout na lage)."""
+    failures = []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                mongo.db[collection].create_index(spec["keys"], **options)
+            except ConnectionFailure as e:
+                # ServerSelectionTimeoutError bhi isi mein aata hai
+                failures.append({"collection": collection, "keys": spec["keys"], "error": str(e)})
+                return failures
+            except PyMongoError as e:
+                failures.append({"collection": collection, "keys": spec["keys"], "error": str(e)})
+    backfill_category_keys()
+    return failures
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def check_query_plans():
+    """Har query shape ka winning plan. Return: (ok, report list)"""
+    report = []
+    for shape in QUERY_SHAPES:
+        cursor = mongo.db[shape["collection"]].find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = set(_plan_stages(plan))
+        report.append({
+            "name": shape["name"],
+            "indexed": "COLLSCAN" not in stages,
+            "stages": sorted(stages)
+        })
+    return all(r["indexed"] for r in report), report
@@ -1,5 +1,16 @@
 from extensions import mongo
 from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Order lifecycle (ek document per Stripe checkout session):
+#   pending -> client ne items/address bheje, payment webhook ka wait
+#   paid    -> checkout.session.completed webhook aa gaya
+#   expired / failed -> session expire hua, payment fail hua ya Stripe pe session
+#              mila hi nahi (webhook ya reconcile_orders.py sweep se; sirf pending se)
+# Dono kisi bhi order mein aa sakte hain; dono writes `session_id` pe upsert hain
+# aur `payment_id` / `session_id` pe unique index duplicates rokta hai.
+
 
 class Order:
     @staticmethod
@@ -13,3 +24,96 @@ class Order:
             "status": "paid",
             "created_at": created_at
         })
+
+    @staticmethod
+    def record_intent(session_id, email, items, total, address_details):
+        """Client ka order data save karo (status nahi badalta). Session kisi aur
+        user ka ho toh None."""
+        now = datetime.utcnow()
+        query = {"session_id": session_id, "$or": [{"email": {"$exists": False}}, {"email": email}]}
+        update = {
+            "$set": {"email": email, "items": items, "total": total, "address": address_details},
+            "$setOnInsert": {"status": "pending", "created_at": now}
+        }
+        try:
+            return mongo.db.orders.find_one_and_update(
+                query, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Webhook ka mark_paid isi waqt insert kar gaya (aam timing), ya session
+            # kisi aur email ka hai. Bina upsert dobara: match na ho tabhi None.
+            return mongo.db.orders.find_one_and_update(
+                query, update, return_document=ReturnDocument.AFTER
+            )
+
+    @staticmethod
+    def mark_paid(session_id, payment_id, amount_paid=None, customer_email=None):
+        """Webhook se: idempotent upsert, dobara aaye toh bhi ek hi order."""
+        now = datetime.utcnow()
+        update = {
+            "$set": {"payment_id": payment_id, "status": "paid", "paid_at": now},
+            "$setOnInsert": {"created_at": now}
+        }
+        if amount_paid is not None:
+            update["$set"]["amount_paid"] = amount_paid
+        if customer_email:
+            update["$set"]["customer_email"] = customer_email
+        try:
+            return mongo.db.orders.find_one_and_update(
+                {"session_id": session_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Parallel upsert (client intent) jeet gaya; ab document hai, update karo
+            return mongo.db.orders.find_one_and_update(
+                {"session_id": session_id}, update, return_document=ReturnDocument.AFTER
+            )
+
+    @staticmethod
+    def claim_finalize(session_id):
+        """Paid + intent dono ho aur abhi tak finalize na hua ho toh claim karo.
+        Side effects (co-purchase stats, user address) isse ek hi baar chalte hain."""
+        return mongo.db.orders.find_one_and_update(
+            {
+                "session_id": session_id,
+                "status": "paid",
+                "email": {"$exists": True},
+                "finalized_at": {"$exists": False}
+            },
+            {"$set": {"finalized_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    # --- RECOVERY (reconcile_orders.py) ---
+    @staticmethod
+    def find_unfinalized(cutoff, limit=500):
+        """Paid + intent wale orders jinke side effects cutoff se pehle tak nahi chale
+        (worker fail hua ya process restart hua)."""
+        return list(mongo.db.orders.find(
+            {"status": "paid", "created_at": {"$lt": cutoff}, "paid_at": {"$lt": cutoff},
+             "email": {"$exists": True}, "finalized_at": {"$exists": False}},
+            {"session_id": 1}
+        ).sort("created_at", 1).limit(limit))
+
+    @staticmethod
+    def find_stale_pending(cutoff, limit=500):
+        """Client ne order bheja par paid webhook cutoff tak nahi aaya."""
+        return list(mongo.db.orders.find(
+            {"status": "pending", "created_at": {"$lt": cutoff}, "session_id": {"$exists": True}},
+            {"session_id": 1, "created_at": 1}
+        ).sort("created_at", 1).limit(limit))
+
+    @staticmethod
+    def close_pending(session_id, status, reason):
+        """pending -> expired / failed. Paid order kabhi close nahi hota."""
+        return mongo.db.orders.find_one_and_update(
+            {"session_id": session_id, "status": "pending"},
+            {"$set": {"status": status, "closed_reason": reason, "closed_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def find_status(session_id):
+        return mongo.db.orders.find_one(
+            {"session_id": session_id},
+            {"email": 1, "status": 1, "payment_id": 1, "total": 1, "created_at": 1, "paid_at": 1}
+        )
@@ -0,0 +1,33 @@
+"""Cart totals reconciliation job.
+
+Carts pe `spent`, `remaining`, `itemCount` har write mein maintained hain. Ye job
+un carts ko dhoondhta hai jinke totals items se match nahi karte (purane carts,
+manual DB edits) aur unhe items se dobara calculate karke theek karta hai.
+
+Usage:
+    python reconcile_carts.py            # drift theek karo
+    python reconcile_carts.py --dry-run  # sirf count batao
+"""
+import argparse
+
+from cli_app import create_app
+from models.cart_model import Cart
+
+
+def run(dry_run=False):
+    drifted = Cart.count_drifted()
+    if dry_run or not drifted:
+        print(f"{drifted} cart(s) with drifted totals")
+        return drifted
+    fixed = Cart.reconcile_totals()
+    print(f"✅ {fixed} / {drifted} cart(s) ke totals reconcile hue")
+    return fixed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and repair drift in maintained cart totals")
+    parser.add_argument("--dry-run", action="store_true", help="sirf drifted carts count karo")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        run(dry_run=args.dry_run)
@@ -0,0 +1,43 @@
+"""Order ingestion recovery sweep.
+
+Webhook order ko ack se pehle paid mark kar deta hai, par side effects (co-purchase
+stats, user address) background worker chalata hai. Worker fail ho ya process
+restart ho jaaye toh wo orders `paid` par unfinalized reh jaate hain. Aur agar
+webhook aaya hi nahi toh order `pending` reh jaata hai. Ye job dono ko theek karta hai
+aur jo sessions expire / fail ho gaye (ya Stripe pe hain hi nahi) unhe `expired` /
+`failed` kar deta hai, taaki pending set badhta na rahe (cron pe har kuch minute chalao).
+
+Usage:
+    python reconcile_orders.py                    # 15 min se purane atke orders
+    python reconcile_orders.py --older-than 60
+    python reconcile_orders.py --no-stripe        # sirf finalize, Stripe API nahi
+    python reconcile_orders.py --dry-run          # sirf count batao
+"""
+import argparse
+import os
+
+import stripe
+
+from cli_app import create_app
+from repositories.order_ingestion import sweep
+
+
+def run(older_than, check_stripe=True, dry_run=False):
+    result = sweep(older_than, check_stripe=check_stripe, dry_run=dry_run)
+    print(f"{result['unfinalized']} unfinalized paid order(s), {result['pending']} stale pending order(s)")
+    if not dry_run:
+        print(f"✅ {result['paid']} order(s) Stripe se paid mark hue, {result['finalized']} finalize hue, "
+              f"{result['expired']} expired, {result['failed']} failed")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finalize stuck orders and recover missed Stripe payments")
+    parser.add_argument("--older-than", type=int, default=15, help="minutes (abhi chal rahe jobs ko mat chhedo)")
+    parser.add_argument("--no-stripe", action="store_true", help="pending orders Stripe se check mat karo")
+    parser.add_argument("--dry-run", action="store_true", help="sirf count karo")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+        run(args.older_than, check_stripe=not args.no_stripe, dry_run=args.dry_run)
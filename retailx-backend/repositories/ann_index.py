@@ -0,0 +1,201 @@
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+try:
+    import fcntl
+except ImportError:  # Windows: file lock nahi, single process hi chalao
+    fcntl = None
+
+# --- APPROXIMATE NEAREST NEIGHBOUR INDEX (Random-projection LSH) ---
+# Bade catalogs (lakhs of SKUs) ke liye exact sparse scan bhi slow hai.
+# Har TF-IDF vector ko `n_tables` hash tables mein `n_bits` random hyperplanes
+# ke sign se bucket kiya jata hai (SimHash). Query sirf apne buckets (aur
+# multi-probe mein paas wale buckets) ke candidates ko exact score karti hai.
+#
+# Recall tuning: zyada n_tables / n_probes = zyada recall, zyada candidates.
+# Zyada n_bits = chhote buckets, fast query, kam recall.
+
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", os.path.join("data", "ann_index.pkl"))
+DEFAULT_TABLES = int(os.getenv("ANN_TABLES", 8))
+DEFAULT_BITS = int(os.getenv("ANN_BITS", 14))
+DEFAULT_PROBES = int(os.getenv("ANN_PROBES", 2))
+MAX_CANDIDATES = int(os.getenv("ANN_MAX_CANDIDATES", 2000))
+HASH_CHUNK = 10000
+
+
+class LSHIndex:
+    def __init__(self, vectorizer, n_tables=DEFAULT_TABLES, n_bits=DEFAULT_BITS, seed=42):
+        self.vectorizer = vectorizer
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        dim = len(vectorizer.vocabulary_)
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((dim, n_tables * n_bits)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(n_bits)).astype(np.int64)
+
+        self.tables = [dict() for _ in range(n_tables)]
+        self.ids = []
+        self.row_of = {}
+        self.row_keys = []
+        self.deleted = set()
+        self.vectors = sp.csr_matrix((0, dim), dtype=np.float64)
+        self._appended = []  # insert() wale rows, query pe vectors ke baad aate hain
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.row_of)
+
+    # --- hashing ---
+    def _project(self, vectors):
+        # planes float32 hain; vector ko bhi float32 karo warna scipy har query pe
+        # poora planes matrix float64 mein upcast karta hai (vocab ke saath slow)
+        return np.asarray(vectors.astype(np.float32) @ self.planes).reshape(-1, self.n_tables, self.n_bits)
+
+    def _keys(self, projections):
+        return (projections > 0).astype(np.int64) @ self._bit_weights
+
+    def _add_rows(self, keys, first_row):
+        for offset, row_keys in enumerate(keys):
+            row = first_row + offset
+            row_keys = tuple(int(k) for k in row_keys)
+            self.row_keys.append(row_keys)
+            for table, key in zip(self.tables, row_keys):
+                table.setdefault(key, []).append(row)
+
+    def build(self, matrix, ids):
+        with self._lock:
+            self.vectors = matrix.tocsr()
+            self.ids = list(ids)
+            self.row_of = {pid: i for i, pid in enumerate(self.ids)}
+            for start in range(0, matrix.shape[0], HASH_CHUNK):
+                chunk = self.vectors[start:start + HASH_CHUNK]
+                self._add_rows(self._keys(self._project(chunk)), start)
+        return self
+
+    # --- incremental updates ---
+    def insert(self, product_id, content):
+        """Naya/badla product bina full rebuild ke add karo. Vocabulary wahi
+        rehti hai jo build ke time thi (naye words ignore hote hain)."""
+        vector = self.vectorizer.transform([content])
+        keys = self._keys(self._project(vector))
+        with self._lock:
+            self.remove(product_id)
+            row = len(self.ids)
+            self.ids.append(product_id)
+            self._appended.append(vector)
+            self.row_of[product_id] = row
+            self._add_rows(keys, row)
+
+    def remove(self, product_id):
+        with self._lock:
+            row = self.row_of.pop(product_id, None)
+            if row is None:
+                return
+            for table, key in zip(self.tables, self.row_keys[row]):
+                bucket = table.get(key)
+                if bucket and row in bucket:
+                    bucket.remove(row)
+            self.deleted.add(row)
+
+    def _vector_rows(self, rows):
+        """Rows ko (base matrix, appended) order mein group karke ek hi
+        sparse matrix return karta hai. Return: (ordered_rows, matrix)"""
+        base = self.vectors.shape[0]
+        base_rows = [r for r in rows if r < base]
+        extra_rows = [r for r in rows if r >= base]
+        parts = []
+        if base_rows:
+            parts.append(self.vectors[base_rows])
+        parts.extend(self._appended[r - base] for r in extra_rows)
+        return base_rows + extra_rows, sp.vstack(parts).tocsr()
+
+    # --- query ---
+    def _candidates(self, projection, n_probes):
+        candidates = set()
+        keys = self._keys(projection[None, :, :])[0]
+        for t, table in enumerate(self.tables):
+            probe_keys = [int(keys[t])]
+            if n_probes:
+                # Multi-probe: jo bits hyperplane ke sabse paas hain unhe flip karke
+                # padosi buckets bhi dekho
+                closest_bits = np.argsort(np.abs(projection[t]))[:n_probes]
+                probe_keys += [int(keys[t]) ^ (1 << int(b)) for b in closest_bits]
+            for key in probe_keys:
+                candidates.update(table.get(key, ()))
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+        return candidates
+
+    def query_vector(self, vector, k, n_probes=DEFAULT_PROBES, exclude=None):
+        with self._lock:
+            projection = self._project(vector)[0]
+            candidates = self._candidates(projection, n_probes)
+            candidates.difference_update(self.deleted)
+            if exclude is not None:
+                candidates.discard(exclude)
+            if not candidates:
+                return []
+
+            rows, vectors = self._vector_rows(list(candidates)[:MAX_CANDIDATES])
+            scores = (vectors @ vector.T).toarray().ravel()
+            top = np.argsort(-scores)[:k]
+            return [(self.ids[rows[i]], float(scores[i])) for i in top if scores[i] > 0]
+
+    def query_id(self, product_id, k, n_probes=DEFAULT_PROBES):
+        row = self.row_of.get(product_id)
+        if row is None:
+            return []
+        return self.query_vector(self._vector_rows([row])[1], k, n_probes, exclude=row)
+
+    # --- persistence ---
+    def save(self, path=ANN_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            state = {k: v for k, v in self.__dict__.items() if k != "_lock"}
+            payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        index._lock = threading.RLock()
+        return index
+
+
+@contextmanager
+def index_file_lock(path=ANN_INDEX_PATH):
+    """Cross-process lock: saare workers (aur build_similar.py --ann) same file
+    likhte hain, toh load -> changes -> save ke beech koi aur save na kare."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def index_mtime(path=ANN_INDEX_PATH):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def build_ann_index(products, content_fn, n_tables=DEFAULT_TABLES, n_bits=DEFAULT_BITS):
+    vectorizer = TfidfVectorizer(stop_words='english')
+    matrix = vectorizer.fit_transform([content_fn(p) for p in products])
+    return LSHIndex(vectorizer, n_tables, n_bits).build(matrix, [p['id'] for p in products])
@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import datetime
+from pymongo import ReturnDocument
+from extensions import mongo
+
+# --- CATALOG CHANGE EVENTS ---
+# Seller routes jab bhi products collection badalte hain, yahan notify karte hain.
+# In-process caches (recommendation model waghera) listener register karke
+# apne aap invalidate/rebuild ho jaate hain.
+#
+# Version counter MongoDB mein rakha hai (meta collection) taaki dusre
+# worker processes ko bhi pata chal jaye ki catalog badal gaya hai.
+
+CATALOG_META_ID = "catalog"
+VERSION_CHECK_INTERVAL = 5  # seconds, itni der tak version memo rehta hai
+
+_listeners = []
+_version_lock = threading.Lock()
+_version_memo = {"version": None, "updated_at": None, "checked_at": 0.0}
+
+
+def on_catalog_change(listener):
+    """Listener register karo. Listener ko ek event dict milta hai:
+    {"action": "add" | "update" | "delete" | "stock", "product_id": str, "version": int,
+     "before": dict | None, "after": dict | None}
+    before/after mein sirf wahi fields hote hain jo write ne chhue (add pe before None,
+    delete pe after None) - listeners inse decide karte hain ki kya invalidate karna hai.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def bump_catalog_version():
+    doc = mongo.db.meta.find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    version = doc.get("version", 0)
+    with _version_lock:
+        _version_memo["version"] = version
+        _version_memo["updated_at"] = doc.get("updatedAt")
+        _version_memo["checked_at"] = time.monotonic()
+    return version
+
+
+def current_catalog_state(max_age=VERSION_CHECK_INTERVAL):
+    """Return (version, updated_at). Har request pe Mongo hit na ho isliye
+    `max_age` seconds tak memo wala value return hota hai."""
+    now = time.monotonic()
+    with _version_lock:
+        if _version_memo["version"] is not None and now - _version_memo["checked_at"] < max_age:
+            return _version_memo["version"], _version_memo["updated_at"]
+
+    doc = mongo.db.meta.find_one({"_id": CATALOG_META_ID}, {"version": 1, "updatedAt": 1}) or {}
+    version, updated_at = doc.get("version", 0), doc.get("updatedAt")
+    with _version_lock:
+        _version_memo["version"] = version
+        _version_memo["updated_at"] = updated_at
+        _version_memo["checked_at"] = now
+    return version, updated_at
+
+
+def current_catalog_version(max_age=VERSION_CHECK_INTERVAL):
+    """Catalog ka current version (memoised, dekho current_catalog_state)."""
+    return current_catalog_state(max_age)[0]
+
+
+def notify_catalog_change(action, product_id=None, before=None, after=None):
+    version = bump_catalog_version()
+    event = {
+        "action": action,
+        "product_id": str(product_id) if product_id else None,
+        "version": version,
+        "before": before,
+        "after": after
+    }
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            # Ek listener fail ho toh baaki ko rokna nahi hai
+            print(f"Catalog listener error: {e}")
+    return version
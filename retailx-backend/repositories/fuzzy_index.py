@@ -0,0 +1,118 @@
+import heapq
+import re
+from collections import Counter
+from repositories.recommendation_repository import snapshot_derived, normalise_key
+from repositories.products_repository import facet_counts
+
+# --- TYPO-TOLERANT SEARCH (character trigram index) ---
+# Catalog ke words (name, brand, tags) ka vocabulary banta hai. Har word ke
+# trigrams -> words ka index hota hai. Query ke galat word ("sneekers") ke
+# trigrams se sirf kuch candidate words nikalte hain, phir unpe edit distance
+# lagta hai. Kaam vocabulary ke size pe nahi, candidates ke count pe bounded hai.
+
+MAX_CANDIDATE_TERMS = 40  # har query word ke liye itne hi words edit-distance tak jaate hain
+MIN_TERM_LEN = 2
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(str(text or "").lower()) if len(t) >= MIN_TERM_LEN]
+
+
+def trigrams(term):
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(term):
+    return 1 if len(term) <= 5 else 2
+
+
+def bounded_edit_distance(a, b, limit):
+    """Levenshtein distance, par `limit` se zyada ho jaye toh jaldi ruk jaata hai."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    def __init__(self, products):
+        self.products = products
+        self.postings = {}  # term -> set(product positions)
+        for i, p in enumerate(products):
+            tags = p.get("tags") or []
+            text = " ".join([str(p.get("name") or ""), str(p.get("brand") or "")] + [str(t) for t in tags])
+            for term in tokenize(text):
+                self.postings.setdefault(term, set()).add(i)
+
+        self.grams = {}  # trigram -> [terms]
+        for term in self.postings:
+            for gram in trigrams(term):
+                self.grams.setdefault(gram, []).append(term)
+
+    def correct(self, word):
+        """Query word ke liye [(term, distance)] - exact match ho toh sirf wahi."""
+        if word in self.postings:
+            return [(word, 0)]
+
+        shared = Counter()
+        for gram in trigrams(word):
+            shared.update(self.grams.get(gram, ()))
+
+        limit = max_typos(word)
+        matches = []
+        for term, _ in shared.most_common(MAX_CANDIDATE_TERMS):
+            distance = bounded_edit_distance(word, term, limit)
+            if distance <= limit:
+                matches.append((term, distance))
+        return matches
+
+    def scores(self, query, category=None):
+        """Matching product positions -> score (category filter ke baad)."""
+        scores = Counter()
+        words = tokenize(query)
+        for word in words:
+            for term, distance in self.correct(word):
+                weight = 1.0 - distance / (len(word) + 1)
+                for pos in self.postings[term]:
+                    scores[pos] += weight
+
+        if category:
+            key = normalise_key(category)
+            scores = Counter({pos: s for pos, s in scores.items()
+                              if normalise_key(self.products[pos].get("category")) == key})
+        return scores
+
+    def search(self, query, category=None, limit=50, scores=None):
+        if scores is None:
+            scores = self.scores(query, category)
+
+        def rank(item):
+            pos, score = item
+            p = self.products[pos]
+            return (score, p.get("rating") or 0, p.get("reviewsCount") or 0)
+
+        ranked = heapq.nlargest(limit, scores.items(), key=rank)
+        return [self.products[pos] for pos, _ in ranked]
+
+    def search_with_facets(self, query, category=None, limit=50):
+        """Top results + poore match set ke facets (ek hi scoring pass)."""
+        scores = self.scores(query, category)
+        facets = facet_counts(self.products[pos] for pos in scores)
+        return self.search(query, category, limit, scores), facets
+
+
+# Catalog snapshot ke version ke saath index bhi refresh hota hai
+get_fuzzy_index = snapshot_derived(FuzzyIndex)
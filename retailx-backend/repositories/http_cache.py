@@ -0,0 +1,58 @@
+import os
+from datetime import timezone
+from flask import request, make_response
+from repositories.catalog_events import current_catalog_state
+
+# --- CONDITIONAL GET (ETag / Last-Modified) ---
+# Product document ka validator uske `rev` (seller writes pe $inc) aur
+# `updatedAt` se banta hai; listings ka catalog version se. Client ke paas
+# current version ho toh 304 jaata hai - body dobara read/encode nahi hoti.
+
+PRODUCT_MAX_AGE = int(os.getenv("PRODUCT_MAX_AGE", 0))  # 0 = har baar revalidate
+VALIDATOR_FIELDS = {"rev": 1, "updatedAt": 1, "createdAt": 1}
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def product_validators(doc):
+    """Return (etag, last_modified) - sirf VALIDATOR_FIELDS chahiye."""
+    modified = doc.get("updatedAt") or doc.get("createdAt") or doc["_id"].generation_time
+    modified = _as_utc(modified)
+    etag = f"{doc['_id']}-{doc.get('rev', 0)}-{int(modified.timestamp())}"
+    return etag, modified
+
+
+def catalog_validators(name, state=None):
+    """Listing/search responses: catalog ka koi bhi write inka version badal deta hai.
+    `state` = current_catalog_state() ka (version, updated_at), taaki cache key bhi
+    usi version se bane."""
+    version, updated_at = state or current_catalog_state()
+    return f"{name}-v{version}", _as_utc(updated_at)
+
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        # If-None-Match ho toh If-Modified-Since ignore hota hai (RFC 9110)
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since and last_modified:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def with_cache_headers(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = PRODUCT_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return with_cache_headers(make_response("", 304), etag, last_modified)
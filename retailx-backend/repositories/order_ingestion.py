@@ -0,0 +1,191 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from models.order_model import Order
+from models.user_model import User
+from repositories.synergy_repository import record_order
+
+# --- ASYNC ORDER INGESTION (Stripe webhook -> bounded queue -> workers) ---
+# Webhook ack karne se pehle sirf ek idempotent write karta hai: order ko paid
+# mark karna (session_id pe upsert, unique payment_id). Wo fail ho toh Stripe ko
+# 500 jaata hai aur wo retry karta hai, isliye paid event kabhi khota nahi.
+# Baaki side effects (co-purchase stats, user ka contact/address) bounded queue
+# se workers ek hi baar chalate hain. Worker fail ho, queue full ho ya process
+# restart ho jaaye toh `python reconcile_orders.py` (sweep) unhe baad mein chala
+# deta hai, aur jin pending orders ka webhook aaya hi nahi unhe Stripe se check karta hai.
+
+ORDER_QUEUE_SIZE = int(os.getenv("ORDER_QUEUE_SIZE", 1000))
+ORDER_WORKERS = int(os.getenv("ORDER_WORKERS", 2))
+MAX_ATTEMPTS = 3
+# Delayed payment methods (bank debits) itne ghante tak unpaid reh sakte hain;
+# uske baad bhi unpaid session wala order failed ho jaata hai
+PAYMENT_WINDOW_HOURS = int(os.getenv("ORDER_PAYMENT_WINDOW_HOURS", 72))
+
+_jobs = queue.Queue(maxsize=ORDER_QUEUE_SIZE)
+_workers_lock = threading.Lock()
+_workers = []
+_stats = {"enqueued": 0, "processed": 0, "failed": 0, "rejected": 0}
+
+
+def _ensure_workers():
+    if len(_workers) >= ORDER_WORKERS:
+        return
+    with _workers_lock:
+        while len(_workers) < ORDER_WORKERS:
+            worker = threading.Thread(target=_work, name=f"order-worker-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def enqueue(kind, payload):
+    """Return False agar queue full hai (caller ko retry karwana chahiye)."""
+    _ensure_workers()
+    try:
+        _jobs.put_nowait((kind, payload))
+    except queue.Full:
+        _stats["rejected"] += 1
+        return False
+    _stats["enqueued"] += 1
+    return True
+
+
+def mark_session_paid(session):
+    """Stripe checkout.session dict (ya local stub ka same shape) se idempotent paid upsert."""
+    details = session.get("customer_details") or {}
+    amount = session.get("amount_total")
+    return Order.mark_paid(
+        session["id"],
+        session.get("payment_intent") or session["id"],
+        amount / 100 if amount is not None else None,  # Stripe paise mein bhejta hai
+        details.get("email") or session.get("customer_email")
+    )
+
+
+def record_paid_session(session):
+    """Paid mark karo (synchronous) aur finalize queue karo. Queue full hone pe bhi
+    order paid rehta hai; finalize sweep ya client ki create request se hoga."""
+    mark_session_paid(session)
+    return enqueue_finalize(session["id"])
+
+
+def close_session(session, status, reason):
+    """checkout.session.expired / async_payment_failed webhook se."""
+    return Order.close_pending(session["id"], status, reason)
+
+
+def enqueue_finalize(session_id):
+    return enqueue("finalize", {"session_id": session_id})
+
+
+def finalize(session_id):
+    """Paid + client intent dono aa chuke hon tabhi (aur sirf ek baar) chalta hai."""
+    order = Order.claim_finalize(session_id)
+    if not order:
+        return False
+
+    # Co-purchase model incrementally update (order fail nahi hona chahiye)
+    try:
+        record_order(order.get("items") or [])
+    except Exception as e:
+        print(f"Synergy update failed: {e}")
+
+    # Update user's profile with latest contact/address
+    address = order.get("address") or {}
+    User.save_contact_and_address(
+        email=order["email"],
+        contact={
+            "email": address.get("email"),
+            "phone": address.get("phone")
+        },
+        address=address
+    )
+    return True
+
+
+def process(kind, payload):
+    if kind == "finalize":
+        finalize(payload["session_id"])
+
+
+def _work():
+    while True:
+        kind, payload = _jobs.get()
+        try:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    process(kind, payload)
+                    _stats["processed"] += 1
+                    break
+                except Exception as e:
+                    print(f"Order job {kind} {payload.get('session_id')} failed (attempt {attempt}): {e}")
+                    if attempt == MAX_ATTEMPTS:
+                        # Order DB mein paid hai; reconcile_orders.py baad mein finalize karega
+                        _stats["failed"] += 1
+                    else:
+                        time.sleep(0.5 * attempt)
+        finally:
+            _jobs.task_done()
+
+
+def queue_stats():
+    return dict(_stats, queued=_jobs.qsize(), max_size=ORDER_QUEUE_SIZE, workers=len(_workers))
+
+
+# --- RECOVERY SWEEP ---
+def sweep(older_than_minutes=15, check_stripe=True, dry_run=False):
+    """Atke hue orders theek karo.
+    Return: {"unfinalized", "pending", "finalized", "paid", "expired", "failed"}
+    - paid par finalize nahi hua -> finalize
+    - pending, webhook aaya hi nahi -> Stripe se session check karke paid mark + finalize
+    - session expired -> expired; Stripe pe mila hi nahi ya payment window nikal gaya -> failed
+    Sabse purane pehle, taaki har run aage badhe aur pending set khatam hota rahe."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=older_than_minutes)
+    window_cutoff = now - timedelta(hours=PAYMENT_WINDOW_HOURS)
+    result = {"unfinalized": 0, "pending": 0, "finalized": 0, "paid": 0, "expired": 0, "failed": 0}
+
+    unfinalized = Order.find_unfinalized(cutoff)
+    result["unfinalized"] = len(unfinalized)
+    for order in unfinalized:
+        if not dry_run and finalize(order["session_id"]):
+            result["finalized"] += 1
+
+    if not check_stripe:
+        return result
+
+    import stripe  # sirf sweep ko Stripe API chahiye, request path ko nahi
+    pending = Order.find_stale_pending(cutoff)
+    result["pending"] = len(pending)
+    for order in pending:
+        if dry_run:
+            continue
+        session_id = order["session_id"]
+        try:
+            session = stripe.checkout.Session.retrieve(session_id).to_dict()
+        except stripe.InvalidRequestError as e:
+            if e.code == "resource_missing":
+                # Client ne aisa session_id bheja jo Stripe pe hai hi nahi
+                if Order.close_pending(session_id, "failed", "session_not_found"):
+                    result["failed"] += 1
+            else:
+                print(f"Stripe lookup failed for {session_id}: {e}")
+            continue
+        except Exception as e:
+            # Network / API down: agle run mein dobara
+            print(f"Stripe lookup failed for {session_id}: {e}")
+            continue
+
+        if session.get("payment_status") in ("paid", "no_payment_required"):
+            mark_session_paid(session)
+            result["paid"] += 1
+            if finalize(session_id):
+                result["finalized"] += 1
+        elif session.get("status") == "expired":
+            if Order.close_pending(session_id, "expired", "session_expired"):
+                result["expired"] += 1
+        elif order.get("created_at") and order["created_at"] < window_cutoff:
+            if Order.close_pending(session_id, "failed", "payment_not_received"):
+                result["failed"] += 1
+    return result
@@ -0,0 +1,164 @@
+import base64
+import json
+from bson import ObjectId
+from flask import jsonify
+
+# --- KEYSET (CURSOR) PAGINATION ---
+# Skip/offset ki jagah last item ke (sortKey, _id) se agla page shuru hota hai,
+# isliye har page ek index range scan hai - catalog kitna bhi bada ho.
+# Cursor opaque hai (base64 JSON), client use wapas `cursor=` mein bhejta hai.
+
+SORT_OPTIONS = {
+    "newest": ("_id", -1),
+    "price_asc": ("finalPrice", 1),
+    "price_desc": ("finalPrice", -1),
+    "rating": ("rating", -1),
+}
+DEFAULT_SORT = "newest"
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def paginated_response(items, next_cursor):
+    """Body pehle jaisi JSON list hi rehti hai; agle page ka cursor header mein."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+def encode_cursor(sort_name, value, last_id):
+    payload = {"s": sort_name, "v": value, "id": str(last_id)}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort_name):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        last_id = ObjectId(payload["id"])
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+    if payload.get("s") != sort_name:
+        # Dusre sort ka cursor iss sort ke liye meaningless hai
+        raise InvalidCursor("Cursor does not match sort order")
+    return payload.get("v"), last_id
+
+
+def parse_limit(raw_limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """1..maximum mein clamp. Non-numeric pe ValueError (caller 400 de sakta hai)."""
+    limit = int(raw_limit) if raw_limit is not None else default
+    return max(1, min(limit, maximum))
+
+
+def page_size(raw_limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """parse_limit jaisa hi, par galat input pe default."""
+    try:
+        return parse_limit(raw_limit, default, maximum)
+    except (TypeError, ValueError):
+        return max(1, min(default, maximum))
+
+
+def resolve_sort(sort_name):
+    return sort_name if sort_name in SORT_OPTIONS else DEFAULT_SORT
+
+
+def sort_spec(key, direction):
+    # _id tie-breaker se order stable rehta hai (same price/rating wale items)
+    return [(key, direction)] if key == "_id" else [(key, direction), ("_id", direction)]
+
+
+def with_sort_key(projection, key):
+    """Inclusion projection mein sort key na ho toh cursor nahi ban payega."""
+    if not projection or key == "_id":
+        return projection
+    if any(v == 0 for v in projection.values()):
+        # Exclusion projection: bas ensure karo ki sort key exclude na ho
+        return {k: v for k, v in projection.items() if k != key}
+    return dict(projection, **{key: 1})
+
+
+def keyset_filter(key, direction, value, last_id):
+    """Last item ke baad wale docs. MongoDB null/missing ko sabse chhota sort
+    karta hai aur `$gt`/`$lt` null ko kabhi match nahi karte, isliye legacy
+    products (bina rating / finalPrice) ke liye null range alag se jodi jaati hai:
+    ascending mein nulls pehle aate hain, descending mein sabse aakhir mein."""
+    op = "$lt" if direction == -1 else "$gt"
+    if key == "_id":
+        return {"_id": {op: last_id}}
+
+    # {key: None} null aur missing dono match karta hai (index bhi use hota hai)
+    if value is None:
+        same_nulls = {key: None, "_id": {op: last_id}}
+        if direction == -1:
+            return same_nulls
+        return {"$or": [same_nulls, {key: {"$ne": None}}]}
+
+    clauses = [
+        {key: {op: value}},
+        {key: value, "_id": {op: last_id}}
+    ]
+    if direction == -1:
+        clauses.append({key: None})
+    return {"$or": clauses}
+
+
+def paginate_find(collection, query, sort_name=DEFAULT_SORT, limit=DEFAULT_PAGE_SIZE, cursor=None, projection=None):
+    """Return (docs, next_cursor). next_cursor None matlab aakhri page."""
+    sort_name = resolve_sort(sort_name)
+    key, direction = SORT_OPTIONS[sort_name]
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_name)
+        query = {"$and": [query, keyset_filter(key, direction, value, last_id)]}
+
+    # Ek extra doc maango taaki pata chale aage page hai ya nahi
+    projection = with_sort_key(projection, key)
+    docs = list(collection.find(query, projection).sort(sort_spec(key, direction)).limit(limit + 1))
+    return finish_page(docs, key, sort_name, limit)
+
+
+def aggregation_projection(projection):
+    """find() projection ko $project mein badlo: `{"$slice": n}` aggregation mein
+    `{"$slice": ["$field", n]}` likha jaata hai."""
+    return {
+        field: {"$slice": ["$" + field, spec["$slice"]]} if isinstance(spec, dict) and "$slice" in spec else spec
+        for field, spec in projection.items()
+    }
+
+
+def keyset_stages(key, direction, sort_name, limit=DEFAULT_PAGE_SIZE, cursor=None, projection=None):
+    """Ek page ke aggregation stages (keyset $match, $sort, limit+1, $project)."""
+    stages = []
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_name)
+        stages.append({"$match": keyset_filter(key, direction, value, last_id)})
+    stages.append({"$sort": dict(sort_spec(key, direction))})
+    stages.append({"$limit": limit + 1})
+    if projection:
+        stages.append({"$project": aggregation_projection(with_sort_key(projection, key))})
+    return stages
+
+
+def finish_page(docs, key, sort_name, limit):
+    """limit+1 docs se (page, next_cursor) banao."""
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(sort_name, last.get(key) if key != "_id" else None, last["_id"])
+    return docs, next_cursor
+
+
+def paginate_pipeline(collection, pipeline, key, direction, sort_name, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                      projection=None):
+    """Aggregation ke liye keyset pagination (jaise relevance `score` pe sort).
+    `pipeline` mein $sort nahi hona chahiye - wo yahin lagta hai. Projection
+    sort/limit ke baad lagta hai taaki sirf page wale docs slim hon."""
+    stages = list(pipeline) + keyset_stages(key, direction, sort_name, limit, cursor, projection)
+    return finish_page(list(collection.aggregate(stages)), key, sort_name, limit)
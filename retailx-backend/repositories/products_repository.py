@@ -1,12 +1,49 @@
+from collections import Counter
 from extensions import mongo
 from bson import ObjectId
-import re
+from models.indexes import category_key
+from repositories.pagination import (
+    paginate_find, paginate_pipeline, keyset_stages, finish_page, resolve_sort,
+    SORT_OPTIONS, DEFAULT_SORT, DEFAULT_PAGE_SIZE
+)
 
-def format_product(p):
+# --- FIELD PROFILES ---
+# Listing grids ko poora product nahi chahiye. Har profile ek MongoDB projection
+# (network se kam data) aur format_product ka matching output fields set hai.
+#   card   -> grid/list tiles (ek image)
+#   detail -> product page (aiMetadata ke bina)
+#   full   -> sab kuch (default, purana behaviour)
+CARD_FIELDS = [
+    "id", "name", "brand", "category", "price", "discount", "finalPrice",
+    "stock", "rating", "reviewsCount", "imageURL"
+]
+FIELD_PROFILES = {
+    "card": {
+        "projection": {
+            "name": 1, "brand": 1, "category": 1, "price": 1, "discount": 1, "finalPrice": 1,
+            "stock": 1, "rating": 1, "reviewsCount": 1, "imageURL": 1, "images": {"$slice": 1}
+        },
+        "fields": CARD_FIELDS
+    },
+    "detail": {"projection": {"aiMetadata": 0}, "exclude": ["aiMetadata"]},
+    "full": {"projection": None},
+}
+DEFAULT_PROFILE = "full"
+
+
+def resolve_profile(name):
+    return name if name in FIELD_PROFILES else DEFAULT_PROFILE
+
+
+def profile_projection(profile):
+    return FIELD_PROFILES[resolve_profile(profile)]["projection"]
+
+
+def format_product(p, profile=DEFAULT_PROFILE):
     if not p:
         return None
 
-    return {
+    product = {
         "id": str(p.get("_id")),
         "name": p.get("name"),
         "description": p.get("description"),
@@ -30,6 +67,18 @@ def format_product(p):
         "images": p.get("images", [])
     }
 
+    return apply_profile(product, profile)
+
+
+def apply_profile(product, profile):
+    """Pehle se formatted product (jaise catalog snapshot wala) ko profile ke hisaab se slim karo."""
+    spec = FIELD_PROFILES[resolve_profile(profile)]
+    if "fields" in spec:
+        return {key: product.get(key) for key in spec["fields"]}
+    if spec.get("exclude"):
+        return {key: value for key, value in product.items() if key not in spec["exclude"]}
+    return product
+
 
 def get_all_products():
     products = mongo.db.products.find({"isActive": True})
@@ -40,23 +89,170 @@ def get_product_by_id(product_id):
     product = mongo.db.products.find_one({"_id": ObjectId(product_id)})
     return format_product(product)
 
-def get_products_by_search(search_query):
-    # Regex makes it case-insensitive (toys matches Toys)
-    regex = re.compile(search_query, re.IGNORECASE)
-    
-    # Search in name, category, OR brand
-    products = mongo.db.products.find({
-        "isActive": True,
-        "$or": [
-            {"name": regex},
-            {"category": regex},
-            {"brand": regex}
-        ]
+
+MAX_BATCH_IDS = 100
+
+
+def get_products_by_ids(product_ids, fields=DEFAULT_PROFILE):
+    """Kai products ek hi $in query mein, request wale order mein.
+    Return: {"products": [...], "missing": [...], "invalid": [...]}"""
+    ids = list(dict.fromkeys(str(pid).strip() for pid in product_ids if str(pid).strip()))[:MAX_BATCH_IDS]
+    valid, invalid = [], []
+    for pid in ids:
+        (valid if ObjectId.is_valid(pid) else invalid).append(pid)
+
+    found = {}
+    if valid:
+        docs = mongo.db.products.find({"_id": {"$in": [ObjectId(pid) for pid in valid]}}, profile_projection(fields))
+        found = {str(p["_id"]): format_product(p, fields) for p in docs}
+
+    return {
+        "products": [found[pid] for pid in valid if pid in found],
+        "missing": [pid for pid in valid if pid not in found],
+        "invalid": invalid
+    }
+
+
+def list_products(query=None, sort=DEFAULT_SORT, limit=DEFAULT_PAGE_SIZE, cursor=None, fields=DEFAULT_PROFILE):
+    """Active products ka ek page. Return: (products, next_cursor)"""
+    filters = {"isActive": True}
+    filters.update(query or {})
+    docs, next_cursor = paginate_find(
+        mongo.db.products, filters, sort, limit, cursor, profile_projection(fields)
+    )
+    return [format_product(p, fields) for p in docs], next_cursor
+
+
+def search_relevance_pipeline(search_query, extra_match=None):
+    """Text index se match + relevance score. Score = textScore x popularity
+    boost (rating aur reviewsCount), taaki barabar match mein popular product upar aaye.
+    Text index models/indexes.py se banta hai."""
+    match = {"$text": {"$search": search_query}, "isActive": True}
+    match.update(extra_match or {})
+    boost = {"$add": [
+        1,
+        {"$multiply": [0.1, {"$ifNull": ["$rating", 0]}]},
+        {"$multiply": [0.05, {"$ln": {"$add": [{"$ifNull": ["$reviewsCount", 0]}, 1]}}]}
+    ]}
+    return [
+        {"$match": match},
+        {"$addFields": {"score": {"$multiply": [{"$meta": "textScore"}, boost]}}}
+    ]
+
+
+def get_products_by_search(search_query, category_name=None, sort="relevance", limit=DEFAULT_PAGE_SIZE, cursor=None,
+                           fields=DEFAULT_PROFILE):
+    """Relevance (default) ya price/rating/newest order mein ek page.
+    Return: (products, next_cursor)"""
+    sort, key, direction = search_sort(sort)
+    docs, next_cursor = paginate_pipeline(
+        mongo.db.products, search_relevance_pipeline(search_query, category_match(category_name)),
+        key, direction, sort, limit, cursor, profile_projection(fields)
+    )
+    return [format_product(p, fields) for p in docs], next_cursor
+
+
+def search_sort(sort):
+    """Return: (sort_name, key, direction). Search mein 'relevance' bhi valid hai."""
+    if sort == "relevance":
+        return sort, "score", -1
+    sort = resolve_sort(sort)
+    return (sort,) + SORT_OPTIONS[sort]
+
+
+def category_match(category_name):
+    return {"categoryKey": category_key(category_name)} if category_name else {}
+
+
+def get_products_by_category(category_name, sort=DEFAULT_SORT, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                             fields=DEFAULT_PROFILE):
+    # Case-insensitive exact match: lowercase categoryKey pe seedha index lookup
+    return list_products({"categoryKey": category_key(category_name)}, sort, limit, cursor, fields)
+
+
+# --- FACETS (brand / category / price buckets with counts) ---
+# Ek hi aggregation: candidate set ek baar $match hota hai, phir $facet usi set
+# pe hits ka page aur saare facet counts nikalta hai (har facet ke liye alag scan nahi).
+FACET_LIMIT = 20
+PRICE_BUCKETS = [0, 500, 1000, 2500, 5000, 10000]  # aakhri bucket: 10000 se upar
+
+
+def facet_stages():
+    return {
+        "brands": [
+            {"$match": {"brand": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$brand", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT}
+        ],
+        "categories": [
+            {"$match": {"category": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT}
+        ],
+        "price": [
+            {"$bucket": {
+                "groupBy": {"$ifNull": ["$finalPrice", 0]},
+                "boundaries": PRICE_BUCKETS,
+                "default": PRICE_BUCKETS[-1],
+                "output": {"count": {"$sum": 1}}
+            }}
+        ],
+    }
+
+
+def price_bucket_range(lower):
+    i = PRICE_BUCKETS.index(lower)
+    return {"min": lower, "max": PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None}
+
+
+def format_facets(raw):
+    return {
+        "brands": [{"value": b["_id"], "count": b["count"]} for b in raw.get("brands", [])],
+        "categories": [{"value": c["_id"], "count": c["count"]} for c in raw.get("categories", [])],
+        "price": [dict(price_bucket_range(b["_id"]), count=b["count"]) for b in raw.get("price", [])],
+    }
+
+
+def facet_counts(products):
+    """In-memory results (jaise fuzzy search) ke liye same shape ke facets."""
+    brands, categories, prices = Counter(), Counter(), Counter()
+    for p in products:
+        if p.get("brand"):
+            brands[p["brand"]] += 1
+        if p.get("category"):
+            categories[p["category"]] += 1
+        price = p.get("finalPrice") or 0
+        prices[max((b for b in PRICE_BUCKETS if b <= price), default=PRICE_BUCKETS[-1])] += 1
+    return format_facets({
+        "brands": [{"_id": k, "count": n} for k, n in brands.most_common(FACET_LIMIT)],
+        "categories": [{"_id": k, "count": n} for k, n in categories.most_common(FACET_LIMIT)],
+        "price": [{"_id": b, "count": prices[b]} for b in PRICE_BUCKETS if prices[b]],
     })
-    return [format_product(p) for p in products]
 
-def get_products_by_category(category_name):
-    # Case-insensitive exact match for category
-    regex = re.compile(f"^{category_name}$", re.IGNORECASE)
-    products = mongo.db.products.find({"category": regex, "isActive": True})
-    return [format_product(p) for p in products]
\ No newline at end of file
+
+def faceted_page(pipeline, key, direction, sort_name, limit, cursor, fields):
+    """`pipeline` candidate set banata hai; hits (keyset page) aur facets ek $facet mein.
+    Return: (products, next_cursor, facets)"""
+    hits = keyset_stages(key, direction, sort_name, limit, cursor, profile_projection(fields))
+    stages = list(pipeline) + [{"$facet": dict(facet_stages(), hits=hits)}]
+    raw = next(mongo.db.products.aggregate(stages), {})
+    docs, next_cursor = finish_page(raw.get("hits", []), key, sort_name, limit)
+    return [format_product(p, fields) for p in docs], next_cursor, format_facets(raw)
+
+
+def search_with_facets(search_query, category_name=None, sort="relevance", limit=DEFAULT_PAGE_SIZE, cursor=None,
+                       fields=DEFAULT_PROFILE):
+    sort, key, direction = search_sort(sort)
+    pipeline = search_relevance_pipeline(search_query, category_match(category_name))
+    return faceted_page(pipeline, key, direction, sort, limit, cursor, fields)
+
+
+def category_with_facets(category_name, sort=DEFAULT_SORT, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                         fields=DEFAULT_PROFILE):
+    # Category ke andar brand/price facets (categoryKey $match index se hota hai)
+    sort = resolve_sort(sort)
+    key, direction = SORT_OPTIONS[sort]
+    pipeline = [{"$match": dict(category_match(category_name), isActive=True)}]
+    return faceted_page(pipeline, key, direction, sort, limit, cursor, fields)
@@ -0,0 +1,90 @@
+import os
+from models.indexes import category_key
+from repositories.catalog_events import on_catalog_change
+from repositories.result_cache import ResultCache
+
+# --- PRODUCT QUERY CACHE (listing pages + search results) ---
+# Popular category pages aur searches har visitor ke liye Mongo tak na jaayein.
+# Key normalised query params se banti hai, aur har entry tagged hoti hai:
+#   product:<id>  -> result mein ye product hai
+#   scope:<key>   -> category page / category-filtered search
+#   scope:*       -> bina category ki listing
+#   search        -> koi bhi text/fuzzy search
+#   facets        -> result mein facet counts hain (poore match set pe depend karte hain)
+# Seller write pe sirf affected tags drop hote hain (stock update sirf un pages
+# ko chhuta hai jinme wo product dikh raha hai).
+#
+# Invalidation isi process mein hota hai, isliye key mein catalog version bhi hai
+# (wahi jo response ke ETag mein jaata hai): dusre worker ka write version badalte
+# hi (5s memo) naya key banata hai, aur purana page naye ETag ke saath kabhi nahi
+# jaata. Stale serving band hai.
+
+product_query_cache = ResultCache(
+    "product_queries",
+    max_size=int(os.getenv("PRODUCT_CACHE_SIZE", 2000)),
+    ttl=int(os.getenv("PRODUCT_CACHE_TTL", 60)),
+    stale_ttl=0
+)
+
+# In fields ke badalne se product kisi naye page/search mein nahi aata,
+# bas jahan dikh raha hai wahan ka data purana hota hai
+DISPLAY_ONLY_FIELDS = {
+    "stock", "description", "imageURL", "images", "highlights", "specs", "updatedAt", "rev"
+}
+
+
+def normalise_text(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def scope_tag(category):
+    return f"scope:{category_key(category)}" if category else "scope:*"
+
+
+def result_tags(base_tags):
+    """Cached value (products, next_cursor, ...) -> tags, product ids ke saath."""
+    def tags(value):
+        products = value[0] or []
+        return list(base_tags) + [f"product:{p['id']}" for p in products if p and p.get("id")]
+    return tags
+
+
+def cached_listing(params, category, compute, version):
+    """Listing page ka result (compute ka return value) cache se. `version` = jis
+    catalog version ka ETag response pe lagega."""
+    key = ("listing", version, normalise_text(category)) + tuple(params)
+    return product_query_cache.get_or_compute(key, compute, result_tags([scope_tag(category)]))
+
+
+def cached_search(params, query, category, compute, version, facets=False):
+    key = ("search", version, normalise_text(query), normalise_text(category), facets) + tuple(params)
+    base = ["search"] + ([scope_tag(category)] if category else []) + (["facets"] if facets else [])
+    return product_query_cache.get_or_compute(key, compute, result_tags(base))
+
+
+def invalidation_tags(event):
+    product_id = event.get("product_id")
+    before = event.get("before") or {}
+    after = event.get("after") or {}
+    tags = {f"product:{product_id}"} if product_id else set()
+
+    if event["action"] in ("stock", "update"):
+        changed = {field for field in after if before.get(field) != after.get(field)}
+        if before and changed <= DISPLAY_ONLY_FIELDS:
+            return tags
+
+    if event["action"] == "delete":
+        # Baaki pages (aur unke cursors) delete ke baad bhi sahi hain, sirf counts badle
+        return tags | {"facets"}
+
+    # Add ya listing/search ko affect karne wala update (price, name, category...)
+    tags |= {"scope:*", "search"}
+    for doc in (before, after):
+        if doc.get("category"):
+            tags.add(scope_tag(doc["category"]))
+    return tags
+
+
+@on_catalog_change
+def _invalidate_product_queries(event):
+    product_query_cache.invalidate_tags(invalidation_tags(event))
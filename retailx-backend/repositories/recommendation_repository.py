@@ -1,73 +1,391 @@
-import pandas as pd
+import os
 import random
+import threading
+import time
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from repositories.products_repository import get_all_products
+from bson import ObjectId
+from extensions import mongo
+from repositories.products_repository import get_all_products, format_product
+from repositories.catalog_events import on_catalog_change, current_catalog_version
+import numpy as np
+from repositories.similarity_engine import transpose_for_queries, top_k_similar, similarity_rows, top_k_indices
+from repositories.ann_index import LSHIndex, ANN_INDEX_PATH, index_file_lock, index_mtime
 
-# --- SMART TF-IDF LOGIC (Weighted Metadata) ---
-def get_recommendations(product_id, top_n=6): # Default ko thoda badhaya hai
-    all_products = get_all_products()
-    if not all_products:
-        return []
+# --- CACHED RECOMMENDATION MODEL ---
+# TF-IDF ek baar fit hota hai aur requests ke beech reuse hota hai.
+# Model catalog version ke saath tag hota hai; version badalne par purana model
+# serve hota rehta hai jab tak background thread naya model bana raha hai.
+_model_lock = threading.Lock()
+_model_state = {"model": None, "rebuilding": False}
+
+# Itne products se upar exact scan ki jagah ANN index use hota hai
+ANN_MIN_PRODUCTS = int(os.getenv("ANN_MIN_PRODUCTS", 20000))
+# Dusre worker / build_similar.py ne file badli ho toh itne seconds mein reload
+ANN_RELOAD_CHECK_SECONDS = int(os.getenv("ANN_RELOAD_CHECK_SECONDS", 30))
+_ann_lock = threading.Lock()
+_ann_state = {"index": None, "loaded": False, "mtime": None, "checked_at": 0.0,
+              "syncing": False, "dirty": set()}
 
-    df = pd.DataFrame(all_products)
-
-    def clean_tags(x):
-        if isinstance(x, list):
-            return " ".join(x)
-        return str(x) if pd.notnull(x) else ""
-
-    # Content Mix with Weighting
-    # Note: 'sub_category' use kiya hai consistently
-    df['content'] = (
-        df['name'].fillna('') + " " + 
-        (df['category'].fillna('') + " ") * 2 + 
-        (df['subCategory'].fillna('') + " ") * 3 + 
-        df['description'].fillna('') + " " + 
-        df['tags'].apply(clean_tags)
+
+def build_content(p):
+    # Content Mix with Weighting (category x2, subCategory x3)
+    tags = p.get('tags')
+    if isinstance(tags, list):
+        tags = " ".join(str(t) for t in tags)
+    return (
+        (p.get('name') or '') + " " +
+        ((p.get('category') or '') + " ") * 2 +
+        ((p.get('subCategory') or '') + " ") * 3 +
+        (p.get('description') or '') + " " +
+        (str(tags) if tags else '')
     )
 
+
+def normalise_key(value):
+    return str(value or '').strip().lower()
+
+
+def build_category_index(products):
+    """Normalised category / subCategory -> product positions (snapshot mein)."""
+    index = {}
+    for i, p in enumerate(products):
+        keys = {normalise_key(p.get('category')), normalise_key(p.get('subCategory'))}
+        for key in keys:
+            if key:
+                index.setdefault(key, []).append(i)
+    return index
+
+
+def sample_positions(postings, k, exclude=None):
+    """Posting lists ke union se k random positions, poori list banaye ya
+    shuffle kiye bina. Random index pick karke duplicates/excluded skip hote
+    hain; bahut zyada collisions ho (chhoti lists) tabhi exact fallback."""
+    sizes = [len(plist) for plist in postings]
+    total = sum(sizes)
+    if total == 0 or k <= 0:
+        return []
+
+    seen = set(exclude or ())
+    chosen = []
+    attempts = 0
+    while len(chosen) < k and attempts < 4 * k + 16:
+        attempts += 1
+        r = random.randrange(total)
+        for plist, size in zip(postings, sizes):
+            if r < size:
+                pos = plist[r]
+                break
+            r -= size
+        if pos not in seen:
+            seen.add(pos)
+            chosen.append(pos)
+
+    if len(chosen) < k:
+        rest = list({pos for plist in postings for pos in plist if pos not in seen})
+        chosen += random.sample(rest, min(len(rest), k - len(chosen)))
+    return chosen
+
+
+def build_recommendation_model(version=None):
+    if version is None:
+        version = current_catalog_version()
+    all_products = get_all_products()
+
     tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(df['content'])
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    matrix = matrix_t = None
+    if all_products:
+        try:
+            matrix = tfidf.fit_transform([build_content(p) for p in all_products])
+            matrix_t = transpose_for_queries(matrix)
+        except ValueError as e:
+            # Empty vocabulary (sirf stop words) - model bina matrix ke rahega
+            print(f"TF-IDF Error: {e}")
+
+    return {
+        "version": version,
+        "products": all_products,
+        "index": {p['id']: i for i, p in enumerate(all_products)},
+        "by_category": build_category_index(all_products),
+        "vectorizer": tfidf,
+        "matrix": matrix,
+        "matrix_t": matrix_t
+    }
 
+
+def _rebuild_in_background():
     try:
-        idx = df.index[df['id'].astype(str) == str(product_id)][0]
-        sim_scores = list(enumerate(cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        
-        # Jitne top_n maange hain utne hi return honge
-        sim_scores = sim_scores[1:top_n+1]
-        recommended_indices = [i[0] for i in sim_scores]
-        
-        return df.iloc[recommended_indices].to_dict('records')
+        model = build_recommendation_model()
+        with _model_lock:
+            current = _model_state["model"]
+            if current is None or model["version"] >= current["version"]:
+                _model_state["model"] = model
     except Exception as e:
-        print(f"TF-IDF Error: {e}")
+        print(f"Recommendation model rebuild failed: {e}")
+    finally:
+        with _model_lock:
+            _model_state["rebuilding"] = False
+
+
+def schedule_model_rebuild():
+    with _model_lock:
+        if _model_state["rebuilding"]:
+            return
+        _model_state["rebuilding"] = True
+    threading.Thread(target=_rebuild_in_background, daemon=True).start()
+
+
+def get_recommendation_model():
+    version = current_catalog_version()
+    model = _model_state["model"]
+
+    if model is not None:
+        if model["version"] != version:
+            # Stale model abhi serve karo, naya background mein banega
+            schedule_model_rebuild()
+        return model
+
+    # Cold start: pehli request ko model banne tak wait karna padega
+    with _model_lock:
+        if _model_state["model"] is None:
+            _model_state["model"] = build_recommendation_model(version)
+        return _model_state["model"]
+
+
+def get_catalog_snapshot():
+    """Ek request ke saare buckets isi ek snapshot se compute hote hain.
+    Ye cached model hi hai: formatted active products + id -> position index,
+    ek hi collection pass mein bana hua."""
+    return get_recommendation_model()
+
+
+def snapshot_derived(build):
+    """Snapshot se bane derived indexes (suggest, fuzzy) ke liye getter: index
+    snapshot version ke saath tag hota hai aur version badalne pe ek hi thread
+    `build(products)` se naya banata hai. Return: getter function."""
+    lock = threading.Lock()
+    state = {"current": None}  # (version, index)
+
+    def get():
+        snapshot = get_catalog_snapshot()
+        current = state["current"]
+        if current is not None and current[0] == snapshot["version"]:
+            return current[1]
+
+        with lock:
+            current = state["current"]
+            if current is None or current[0] != snapshot["version"]:
+                current = (snapshot["version"], build(snapshot["products"]))
+                state["current"] = current
+        return current[1]
+
+    return get
+
+
+@on_catalog_change
+def _invalidate_model(event):
+    schedule_model_rebuild()
+
+
+# --- ANN INDEX (build_similar.py --ann se banta hai) ---
+# Har worker process ka apna in-memory index hai aur catalog events sirf usi
+# process mein aate hain. Isliye disk pe likhne se pehle (file lock ke andar)
+# agar file kisi aur ne badli hai toh wahi reload karke apne pending (dirty)
+# product changes DB se dobara apply hote hain - kisi ka insert overwrite nahi hota.
+def get_ann_index():
+    """Disk se persisted LSH index ek baar load hota hai. File na ho toh None."""
+    if not _ann_state["loaded"]:
+        with _ann_lock:
+            if not _ann_state["loaded"]:
+                if os.path.exists(ANN_INDEX_PATH):
+                    try:
+                        _ann_state["mtime"] = index_mtime(ANN_INDEX_PATH)
+                        _ann_state["index"] = LSHIndex.load(ANN_INDEX_PATH)
+                    except Exception as e:
+                        print(f"ANN index load failed: {e}")
+                _ann_state["loaded"] = True
+                _ann_state["checked_at"] = time.monotonic()
+    elif time.monotonic() - _ann_state["checked_at"] >= ANN_RELOAD_CHECK_SECONDS:
+        _ann_state["checked_at"] = time.monotonic()
+        if index_mtime(ANN_INDEX_PATH) != _ann_state["mtime"]:
+            # Reload background mein, tab tak current index serve hota hai
+            _schedule_ann_sync()
+    return _ann_state["index"]
+
+
+def _apply_ann_change(index, product_id):
+    """Product ki current DB state index mein (idempotent)."""
+    product = mongo.db.products.find_one({"_id": ObjectId(product_id), "isActive": True})
+    if product:
+        index.insert(product_id, build_content(format_product(product)))
+    else:
+        index.remove(product_id)
+
+
+def _sync_ann_index():
+    while True:
+        with _ann_lock:
+            pending = _ann_state["dirty"]
+            _ann_state["dirty"] = set()
+        try:
+            with index_file_lock(ANN_INDEX_PATH):
+                index = _ann_state["index"]
+                disk_mtime = index_mtime(ANN_INDEX_PATH)
+                if disk_mtime is not None and disk_mtime != _ann_state["mtime"]:
+                    index = LSHIndex.load(ANN_INDEX_PATH)
+                # Swap se pehle aaye events purane object pe lage the, isliye
+                # pending hamesha (reload ho ya na ho) dobara apply karo
+                for product_id in pending:
+                    _apply_ann_change(index, product_id)
+                if pending:
+                    index.save(ANN_INDEX_PATH)
+                _ann_state["index"] = index
+                _ann_state["mtime"] = index_mtime(ANN_INDEX_PATH)
+        except Exception as e:
+            print(f"ANN index sync failed: {e}")
+            with _ann_lock:
+                # Changes khone nahi chahiye; agle event pe dobara try hoga
+                _ann_state["dirty"] |= pending
+                _ann_state["syncing"] = False
+            return
+
+        with _ann_lock:
+            # Sync ke dauraan naye changes aaye toh ek aur round
+            if not _ann_state["dirty"]:
+                _ann_state["syncing"] = False
+                return
+
+
+def _schedule_ann_sync(product_id=None):
+    with _ann_lock:
+        if product_id:
+            _ann_state["dirty"].add(product_id)
+        if _ann_state["syncing"]:
+            return
+        _ann_state["syncing"] = True
+    threading.Thread(target=_sync_ann_index, daemon=True).start()
+
+
+@on_catalog_change
+def _update_ann_index(event):
+    index = get_ann_index()
+    product_id = event.get("product_id")
+    if index is None or not product_id:
+        return
+
+    if event["action"] == "delete":
+        index.remove(product_id)
+    elif event["action"] in ("add", "update"):
+        _apply_ann_change(index, product_id)
+    else:
+        return
+    _schedule_ann_sync(product_id)
+
+
+# --- SMART TF-IDF LOGIC (Weighted Metadata) ---
+def get_recommendations(product_id, top_n=6, snapshot=None): # Default ko thoda badhaya hai
+    model = snapshot or get_recommendation_model()
+    if model["matrix"] is None:
         return []
 
+    idx = model["index"].get(str(product_id))
+    if idx is None:
+        print(f"TF-IDF Error: product {product_id} not in model")
+        return []
+
+    ann = get_ann_index()
+    if ann is not None and len(ann) >= ANN_MIN_PRODUCTS:
+        neighbours = ann.query_id(str(product_id), top_n)
+        if neighbours:
+            return [model["products"][model["index"][pid]] for pid, _ in neighbours if pid in model["index"]]
+
+    # Sirf is product ki row multiply hoti hai, top_n partial selection se
+    ranked = top_k_similar(model["matrix"], [idx], top_n, model["matrix_t"])[0]
+    return [model["products"][i] for i, _ in ranked]
+
+
+# --- BATCH SIMILAR (cart / checkout pages) ---
+MAX_BATCH_PRODUCTS = 50
+
+
+def get_recommendations_batch(product_ids, top_n=4, snapshot=None):
+    """Kai products ke similar items ek hi sparse multiply mein.
+    Input products kabhi result mein nahi aate, aur ek product sirf us input
+    ke neeche aata hai jisse wo sabse zyada similar hai (no duplicates)."""
+    model = snapshot or get_recommendation_model()
+    ids = list(dict.fromkeys(str(pid) for pid in product_ids))[:MAX_BATCH_PRODUCTS]
+    found = [pid for pid in ids if pid in model["index"]]
+    results = {pid: [] for pid in found}
+    missing = [pid for pid in ids if pid not in model["index"]]
+    if not found or model["matrix"] is None:
+        return {"results": results, "missing": missing}
+
+    rows = [model["index"][pid] for pid in found]
+    sims = similarity_rows(model["matrix"], rows, model["matrix_t"])
+    sims[:, rows] = -np.inf
+
+    # Har candidate product sirf apne best-matching input ko milta hai
+    owner = sims.argmax(axis=0)
+    for r, pid in enumerate(found):
+        own_scores = np.where(owner == r, sims[r], -np.inf)
+        results[pid] = [model["products"][i] for i in top_k_indices(own_scores, top_n)]
+
+    return {"results": results, "missing": missing}
+
+
+# --- PRECOMPUTED NEIGHBOURS (build_similar.py) ---
+def get_similar_products(product_id, top_n=6, snapshot=None):
+    """`similar` field se O(K) lookup. Agar job ne abhi tak ye product
+    process nahi kiya toh cached TF-IDF model pe fallback. Snapshot diya ho
+    toh neighbours usi se resolve hote hain (dusri query nahi)."""
+    try:
+        doc = mongo.db.products.find_one({"_id": ObjectId(product_id)}, {"similar": 1})
+    except Exception:
+        return []
+    if not doc:
+        return []
+    if "similar" not in doc:
+        return get_recommendations(product_id, top_n, snapshot)
+
+    if snapshot is not None:
+        positions = (snapshot["index"].get(n["id"]) for n in doc["similar"])
+        return [snapshot["products"][i] for i in positions if i is not None][:top_n]
+
+    neighbour_ids = [ObjectId(n["id"]) for n in doc["similar"][:top_n]]
+    found = {
+        str(p["_id"]): p
+        for p in mongo.db.products.find({"_id": {"$in": neighbour_ids}, "isActive": True})
+    }
+    return [format_product(found[str(i)]) for i in neighbour_ids if str(i) in found]
+
+
 # --- SMART PREFERENCE LOGIC ---
-def get_preference_recommendations(user_prefs):
-    all_products = get_all_products()
+def get_preference_recommendations(user_prefs, k=8, exclude_ids=None, snapshot=None):
+    snapshot = snapshot or get_catalog_snapshot()
+    all_products = snapshot["products"]
     if not all_products:
         return []
 
     if user_prefs and any(user_prefs):
-        user_prefs_clean = [str(p).strip().lower() for p in user_prefs if p]
-        
-        # Filtering based on Category OR Sub-category
-        filtered = [
-            p for p in all_products 
-            if str(p.get('category')).lower() in user_prefs_clean or 
-               str(p.get('subCategory')).lower() in user_prefs_clean
-        ]
-        
-        if filtered:
-            random.shuffle(filtered) 
-            return filtered # Poori list return kar rahe hain taaki route slice kar sake
+        # Category OR Sub-category index se seedha k random products
+        postings = [snapshot["by_category"].get(normalise_key(p), []) for p in user_prefs if p]
+        picked = sample_positions(postings, k, _excluded_positions(snapshot, exclude_ids))
+        if picked:
+            return [all_products[i] for i in picked]
 
     # Cold Start / No Match
-    try:
-        shuffled_all = random.sample(all_products, len(all_products))
-        return shuffled_all
-    except Exception: 
-        return all_products
\ No newline at end of file
+    return sample_catalog(k, exclude_ids, snapshot)
+
+
+def _excluded_positions(snapshot, exclude_ids):
+    index = snapshot["index"]
+    return {index[pid] for pid in (exclude_ids or ()) if pid in index}
+
+
+# --- DISCOVERY / RANDOM PICKS ---
+def sample_catalog(k, exclude_ids=None, snapshot=None):
+    """Poore active catalog mein se k random products. Sirf k positions
+    pick hoti hain (range ko posting list ki tarah), `remaining` list nahi banti."""
+    snapshot = snapshot or get_catalog_snapshot()
+    products = snapshot["products"]
+    picked = sample_positions([range(len(products))], k, _excluded_positions(snapshot, exclude_ids))
+    return [products[i] for i in picked]
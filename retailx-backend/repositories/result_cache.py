@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- IN-PROCESS RESULT CACHE (TTL + LRU + stale-while-revalidate) ---
+# Entry `ttl` seconds tak fresh hai. Uske baad `stale_ttl` tak stale value
+# turant return hoti hai aur background mein refresh hota hai, taaki user ko
+# cold rebuild ka wait na karna pade. `max_size` se zyada entries hone par
+# sabse purani (least recently used) entry nikal di jaati hai.
+#
+# Entries ke saath tags bhi store ho sakte hain ("product:<id>", "scope:footwear").
+# invalidate_tags() sirf un entries ko drop karta hai jinke tags match karein,
+# baaki cache garam rehta hai.
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+_caches = {}  # name -> ResultCache (stats endpoint ke liye)
+
+
+class ResultCache:
+    def __init__(self, name, max_size=1000, ttl=60, stale_ttl=300):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._key_tags = {}  # key -> tags
+        self._tagged = {}  # tag -> set(keys)
+        self._generation = 0  # har invalidation pe badhta hai
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "refreshes": 0, "invalidations": 0}
+        _caches[name] = self
+
+    def _age_state(self, stored_at, now):
+        age = now - stored_at
+        if age < self.ttl:
+            return "fresh"
+        if age < self.ttl + self.stale_ttl:
+            return "stale"
+        return None
+
+    def get(self, key):
+        """Return (value, state) - state "fresh", "stale" ya None (miss)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            state = self._age_state(entry[1], now) if entry else None
+            if state is None:
+                if entry:
+                    self._drop(key)
+                self._stats["misses"] += 1
+                return None, None
+            self._entries.move_to_end(key)
+            self._stats["hits" if state == "fresh" else "stale_hits"] += 1
+            return entry[0], state
+
+    def _drop(self, key):
+        # Lock ke andar hi call hota hai
+        self._entries.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def set(self, key, value, tags=(), generation=None):
+        """`generation` (compute shuru hone ke time ka) diya ho aur beech mein
+        invalidation ho chuka ho, toh purana result store nahi hota."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return value
+            self._drop(key)
+            self._entries[key] = (value, time.monotonic())
+            if tags:
+                self._key_tags[key] = frozenset(tags)
+                for tag in self._key_tags[key]:
+                    self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return value
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def _refresh(self, key, compute, tags, generation):
+        try:
+            value = compute()
+            self.set(key, value, tags(value) if callable(tags) else tags, generation)
+        except Exception as e:
+            print(f"{self.name} cache refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_compute(self, key, compute, tags=()):
+        """Fresh hit: seedha value. Stale hit: purani value + background
+        refresh (ek key ka ek hi refresh chalta hai). Miss: abhi compute karke store.
+        `tags` ek list ya value -> tags function ho sakta hai."""
+        value, state = self.get(key)
+        if state == "fresh":
+            return value
+        generation = self.generation()
+        if state == "stale":
+            with self._lock:
+                schedule = key not in self._refreshing
+                if schedule:
+                    self._refreshing.add(key)
+                    self._stats["refreshes"] += 1
+            if schedule:
+                _refresh_pool.submit(self._refresh, key, compute, tags, generation)
+            return value
+
+        value = compute()
+        return self.set(key, value, tags(value) if callable(tags) else tags, generation)
+
+    def invalidate_tags(self, tags):
+        """Jin entries pe inme se koi bhi tag hai unhe drop karo. Return: dropped count"""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self._tagged.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def expire_all(self):
+        """Sab entries ko stale bana do (drop nahi): agli request purani value
+        payegi aur background mein naya result banega."""
+        expired_at = time.monotonic() - self.ttl
+        with self._lock:
+            for key, (value, stored_at) in self._entries.items():
+                self._entries[key] = (value, min(stored_at, expired_at))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._key_tags.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_size=self.max_size)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def all_cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
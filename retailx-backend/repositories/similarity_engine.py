@@ -0,0 +1,47 @@
+import numpy as np
+
+# --- SPARSE TOP-K SIMILARITY KERNEL ---
+# TfidfVectorizer rows L2-normalised hoti hain, isliye sparse dot product hi
+# cosine similarity hai. Sirf query rows multiply hoti hain, N x N matrix kabhi
+# nahi banta: memory O(N) per query row.
+
+
+def transpose_for_queries(matrix):
+    # CSR x CSR multiply sabse fast hai, isliye transpose ek baar CSR mein rakh lo
+    return matrix.T.tocsr()
+
+
+def similarity_rows(matrix, query_rows, matrix_t=None):
+    """Query rows (batch) ke liye poore catalog ke against scores.
+    Return shape: (len(query_rows), N) dense float array."""
+    if matrix_t is None:
+        matrix_t = transpose_for_queries(matrix)
+    return (matrix[query_rows] @ matrix_t).toarray()
+
+
+def top_k_indices(scores, k, exclude=None):
+    """Ek score row mein se top-k indices (desc order), argpartition se -
+    poora row sort nahi hota. `exclude` wale indices kabhi return nahi hote."""
+    scores = np.array(scores, dtype=float, copy=True)
+    if exclude:
+        scores[list(exclude)] = -np.inf
+
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        part = np.argpartition(-scores[candidates], k - 1)[:k]
+        candidates = candidates[part]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_similar(matrix, query_rows, k, matrix_t=None, exclude_self=True):
+    """Batch version: har query row ke liye [(index, score), ...] list."""
+    if k <= 0 or not len(query_rows):
+        return [[] for _ in query_rows]
+
+    sims = similarity_rows(matrix, query_rows, matrix_t)
+    results = []
+    for offset, row_idx in enumerate(query_rows):
+        exclude = [row_idx] if exclude_self else None
+        top = top_k_indices(sims[offset], k, exclude)
+        results.append([(int(i), float(sims[offset, i])) for i in top])
+    return results
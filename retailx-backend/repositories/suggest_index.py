@@ -0,0 +1,78 @@
+import heapq
+from bisect import bisect_left
+from repositories.recommendation_repository import snapshot_derived
+
+# --- TYPE-AHEAD SUGGESTIONS (sorted keys + bisect) ---
+# Product names, brands, categories ke lowercase keys ek sorted array mein
+# rehte hain. Prefix ki range do bisect se milti hai, isliye har keystroke
+# microseconds ka kaam hai, MongoDB tak jaana hi nahi padta.
+# Name ke har word se bhi key banti hai ("air max" bhi "Nike Air Max" dega).
+# Bahut chhote prefixes (1-3 chars) ke top results build ke time hi nikal liye jaate hain.
+
+SHORT_PREFIX_LEN = 3
+SHORT_PREFIX_TOP = 20
+
+
+class SuggestIndex:
+    def __init__(self, products):
+        entries = {}  # (type, text) -> entry dict
+
+        def add(kind, text, weight, product_id=None):
+            text = str(text or "").strip()
+            if not text:
+                return
+            entry = entries.setdefault((kind, text.lower()), {
+                "text": text, "type": kind, "weight": 0.0, "id": product_id
+            })
+            entry["weight"] += weight
+
+        for p in products:
+            popularity = (1 + (p.get("rating") or 0)) * (1 + (p.get("reviewsCount") or 0)) ** 0.5
+            add("product", p.get("name"), popularity, p.get("id"))
+            add("brand", p.get("brand"), 1)
+            add("category", p.get("category"), 1)
+            add("category", p.get("subCategory"), 1)
+
+        self.entries = list(entries.values())
+        pairs = []
+        for i, entry in enumerate(self.entries):
+            words = entry["text"].lower().split()
+            for w in range(len(words)):
+                pairs.append((" ".join(words[w:]), i))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.entry_ids = [i for _, i in pairs]
+
+        self.short_top = {}
+        for key, i in pairs:
+            for n in range(1, min(SHORT_PREFIX_LEN, len(key)) + 1):
+                self.short_top.setdefault(key[:n], set()).add(i)
+        for prefix, ids in self.short_top.items():
+            self.short_top[prefix] = self._rank(ids, SHORT_PREFIX_TOP)
+
+    def _rank(self, entry_ids, limit):
+        return heapq.nlargest(limit, set(entry_ids), key=lambda i: self.entries[i]["weight"])
+
+    def suggest(self, prefix, limit=8):
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX_LEN:
+            ranked = self.short_top.get(prefix, [])[:limit]
+        else:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\uffff")
+            ranked = self._rank(self.entry_ids[lo:hi], limit)
+
+        results = []
+        for i in ranked:
+            entry = self.entries[i]
+            item = {"text": entry["text"], "type": entry["type"]}
+            if entry["id"]:
+                item["id"] = entry["id"]
+            results.append(item)
+        return results
+
+
+# Catalog snapshot ke version ke saath index bhi refresh hota hai
+get_suggest_index = snapshot_derived(SuggestIndex)
@@ -0,0 +1,67 @@
+import heapq
+from pymongo import UpdateOne
+from bson import ObjectId
+from extensions import mongo
+from repositories.products_repository import format_product
+
+# --- CO-PURCHASE ("Frequently bought together") MODEL ---
+# copurchases collection mein har product ka ek sparse row hota hai:
+#   {"_id": "<productId>", "counts": {"<otherProductId>": <kitni baar saath bika>}}
+# Har naye order pe sirf us order ke pairs $inc hote hain, order history
+# dobara scan nahi hoti.
+
+MAX_ITEMS_PER_ORDER = 50  # pairs O(n^2) hote hain, bahut bade orders ko cap karo
+
+
+def order_product_ids(items):
+    ids = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        pid = item.get("productId") or item.get("id") or item.get("_id")
+        if pid and str(pid) not in ids:
+            ids.append(str(pid))
+    return ids[:MAX_ITEMS_PER_ORDER]
+
+
+def record_order(items):
+    ids = order_product_ids(items)
+    if len(ids) < 2:
+        return 0
+
+    ops = []
+    for pid in ids:
+        inc = {f"counts.{other}": 1 for other in ids if other != pid}
+        ops.append(UpdateOne({"_id": pid}, {"$inc": inc}, upsert=True))
+    mongo.db.copurchases.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def get_synergy_picks(product_ids, k=6, exclude_ids=None, snapshot=None):
+    """Diye gaye products ke saath sabse zyada bikne wale products (ek lookup)."""
+    product_ids = [str(pid) for pid in product_ids if pid]
+    if not product_ids:
+        return []
+
+    totals = {}
+    for row in mongo.db.copurchases.find({"_id": {"$in": product_ids}}):
+        for other, count in row.get("counts", {}).items():
+            totals[other] = totals.get(other, 0) + count
+
+    skip = set(product_ids) | set(exclude_ids or ())
+    ranked = heapq.nlargest(
+        k * 2,  # kuch inactive/deleted nikal sakte hain
+        ((count, pid) for pid, count in totals.items() if pid not in skip)
+    )
+    ranked_ids = [pid for _, pid in ranked]
+
+    if snapshot is not None:
+        positions = (snapshot["index"].get(pid) for pid in ranked_ids)
+        return [snapshot["products"][i] for i in positions if i is not None][:k]
+
+    object_ids = [ObjectId(pid) for pid in ranked_ids if ObjectId.is_valid(pid)]
+    found = {
+        str(p["_id"]): p
+        for p in mongo.db.products.find({"_id": {"$in": object_ids}, "isActive": True})
+    }
+    return [format_product(found[pid]) for pid in ranked_ids if pid in found][:k]
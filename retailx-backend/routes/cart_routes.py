@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models.cart_model import Cart
 from bson import ObjectId
+import math
 
 cart_bp = Blueprint("cart", __name__, url_prefix="/api/cart")
 
@@ -8,76 +9,213 @@ cart_bp = Blueprint("cart", __name__, url_prefix="/api/cart")
 def handle_options():
     return jsonify({"status": "ok"}), 200
 
+
+def cart_response(cart):
+    # Har write ka post-image hi response hai, dobara find nahi karna padta
+    return {
+        "items": cart.get("items", []),
+        "monthlyBudget": cart.get("monthlyBudget"),
+        **Cart.totals(cart)
+    }
+
+
+def budget_error(cart):
+    return jsonify({
+        "error": f"Budget Full! Limit: ₹{cart.get('monthlyBudget')}",
+        **cart_response(cart)
+    }), 400
+
+
+def request_user_id(data):
+    user_id = data.get("userId")
+    return user_id if user_id and ObjectId.is_valid(user_id) else None
+
+
+def line_error(data):
+    """Add/merge line ka quantity (>= 1) aur price (number, >= 0) check.
+    Negative quantity spent ghata deti aur budget guard bypass ho jaata."""
+    try:
+        quantity = int(data.get("quantity", 1))
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity < 1:
+        return "quantity must be at least 1"
+    try:
+        price = float(data.get("price") or 0)
+    except (TypeError, ValueError):
+        price = -1
+    if not math.isfinite(price) or price < 0:
+        return "price must be a non-negative number"
+    return None
+
+
 @cart_bp.route("/", methods=["GET", "OPTIONS"])
 def get_cart():
     if request.method == "OPTIONS": return handle_options()
-    
-    user_id = request.args.get("userId")
+
+    user_id = request_user_id(request.args)
     if not user_id: return jsonify({"error": "userId required"}), 400
-    
-    cart = Cart.find_by_user(user_id)
-    if not cart:
-        Cart.create_cart(user_id)
-        cart = Cart.find_by_user(user_id)
-        
-    spent_data = Cart.calculate_spent(cart)
-    return jsonify({
-        "items": cart.get("items", []), 
-        "monthlyBudget": cart.get("monthlyBudget", 2000), 
-        **spent_data
-    })
+
+    return jsonify(cart_response(Cart.get_or_create(user_id)))
 
 @cart_bp.route("/add", methods=["POST", "OPTIONS"])
 def add_item():
     if request.method == "OPTIONS": return handle_options()
-    
-    data = request.json
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+    if not data.get("productId"): return jsonify({"error": "productId required"}), 400
+
+    error = line_error(data)
+    if error: return jsonify({"error": error}), 400
+
     # ✅ Ab hum pura data object bhej rahe hain model ko
     # Model isme se name, imageURL, etc. nikal lega
-    res, status = Cart.add_item(data.get("userId"), data)
-    
-    if status != 200: return jsonify(res), status
-    
-    cart = Cart.find_by_user(data.get("userId"))
-    return jsonify({"items": cart.get("items", []), **Cart.calculate_spent(cart)})
+    cart, applied = Cart.add_item(user_id, data)
+    if not applied: return budget_error(cart)
+
+    return jsonify(cart_response(cart))
 
 @cart_bp.route("/update", methods=["POST", "OPTIONS"])
 def update_quantity():
     if request.method == "OPTIONS": return handle_options()
-    
-    data = request.json
-    from extensions import mongo
-    
-    # Quantity update logic
-    mongo.db.carts.update_one(
-        {"userId": ObjectId(data.get("userId")), "items.productId": data.get("productId")},
-        {"$set": {"items.$.quantity": data.get("quantity")}}
-    )
-    
-    cart = Cart.find_by_user(data.get("userId"))
-    return jsonify({"items": cart.get("items", []), **Cart.calculate_spent(cart)})
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+    if not data.get("productId"): return jsonify({"error": "productId required"}), 400
+
+    try:
+        quantity = int(data.get("quantity", 1))
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity < 1: return jsonify({"error": "quantity must be at least 1"}), 400
+
+    # Quantity update logic (badhane pe budget check bhi isi write mein)
+    cart, applied = Cart.update_quantity(user_id, data.get("productId"), quantity)
+    if not applied: return budget_error(cart)
+
+    return jsonify(cart_response(cart))
 
 @cart_bp.route("/remove", methods=["POST", "OPTIONS"])
 def remove_item():
     if request.method == "OPTIONS": return handle_options()
-    
-    data = request.json
-    # Model mein humne $pull use kiya hai, toh budget safe rahega
-    Cart.remove_item(data.get("userId"), data.get("productId"))
-    
-    cart = Cart.find_by_user(data.get("userId"))
-    return jsonify({"items": cart.get("items", []), **Cart.calculate_spent(cart)})
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+    if not data.get("productId"): return jsonify({"error": "productId required"}), 400
+
+    # Remove se total kam hi hota hai, toh budget safe rahega
+    cart, _ = Cart.remove_item(user_id, data.get("productId"))
+    return jsonify(cart_response(cart))
 
 @cart_bp.route("/budget", methods=["POST", "OPTIONS"])
 def set_budget():
     if request.method == "OPTIONS": return handle_options()
-    
+
     data = request.json
-    Cart.update_budget(data.get("userId"), data.get("monthlyBudget"))
-    
-    cart = Cart.find_by_user(data.get("userId"))
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+
+    try:
+        monthly_budget = float(data.get("monthlyBudget"))
+    except (TypeError, ValueError):
+        monthly_budget = -1
+    # NaN/inf pe har add ka budget check fail hota aur percentUsed invalid JSON banta
+    if not math.isfinite(monthly_budget) or monthly_budget < 0:
+        return jsonify({"error": "monthlyBudget must be a non-negative number"}), 400
+
+    cart = Cart.update_budget(user_id, monthly_budget)
+    # Items bhi bhejo taaki UI sync rahe
+    return jsonify(cart_response(cart))
+
+# --- BULK OPERATIONS ---
+# POST /api/cart/bulk  {"userId", "operations": [{"op": "add" | "update" | "remove", "productId", "quantity", ...}]}
+# Saare operations ek hi atomic write mein; budget final total pe check hota hai
+# (ek bhi op budget todta hai toh koi op nahi lagta).
+MAX_BULK_OPERATIONS = 100
+BULK_OPS = ("add", "update", "remove", "merge")
+
+
+def validate_operations(operations):
+    """Return (clean operations, error message)"""
+    if not isinstance(operations, list) or not operations:
+        return None, "operations required"
+    if len(operations) > MAX_BULK_OPERATIONS:
+        return None, f"At most {MAX_BULK_OPERATIONS} operations per request"
+
+    clean = []
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in BULK_OPS or not operation.get("productId"):
+            return None, f"operations[{i}]: op ({', '.join(BULK_OPS)}) and productId required"
+        if operation["op"] != "remove":
+            error = line_error(operation)
+            if error:
+                return None, f"operations[{i}]: {error}"
+            operation = dict(operation, quantity=int(operation.get("quantity", 1)))
+        clean.append(operation)
+    return clean, None
+
+
+@cart_bp.route("/bulk", methods=["POST", "OPTIONS"])
+def bulk_update():
+    if request.method == "OPTIONS": return handle_options()
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+
+    operations, error = validate_operations(data.get("operations"))
+    if error: return jsonify({"error": error}), 400
+
+    cart, applied = Cart.apply_bulk(user_id, operations)
+    if not applied: return budget_error(cart)
+    return jsonify(cart_response(cart))
+
+
+# Guest login ke baad: POST /api/cart/merge  {"userId", "items": [guest cart lines]}
+# Jo product dono mein hai uski quantity max hoti hai (merge dobara chale toh bhi double nahi hota)
+@cart_bp.route("/merge", methods=["POST", "OPTIONS"])
+def merge_guest_cart():
+    if request.method == "OPTIONS": return handle_options()
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+
+    items = data.get("items")
+    if not isinstance(items, list):
+        return jsonify({"error": "items required"}), 400
+    if not items:
+        return jsonify(cart_response(Cart.get_or_create(user_id)))
+
+    operations, error = validate_operations([dict(item, op="merge") for item in items if isinstance(item, dict)])
+    if error: return jsonify({"error": error}), 400
+
+    cart, applied = Cart.apply_bulk(user_id, operations)
+    if not applied: return budget_error(cart)
+    return jsonify(cart_response(cart))
+
+
+# --- CHECKOUT VALIDATION ---
+# POST /api/cart/validate  {"userId"}
+# Payment se pehle: har line ka price products ke finalPrice se, stock aur isActive
+# check (ek $in query), aur corrected cart DB mein bhi save ho jaata hai.
+@cart_bp.route("/validate", methods=["POST", "OPTIONS"])
+def validate_cart():
+    if request.method == "OPTIONS": return handle_options()
+
+    data = request.json or {}
+    user_id = request_user_id(data)
+    if not user_id: return jsonify({"error": "userId required"}), 400
+
+    cart, issues = Cart.validate_for_checkout(user_id)
+    response = cart_response(cart)
     return jsonify({
-        "items": cart.get("items", []), # Items bhi bhejo taaki UI sync rahe
-        "monthlyBudget": cart.get("monthlyBudget"),
-        **Cart.calculate_spent(cart)
-    })
\ No newline at end of file
+        **response,
+        "valid": not issues and response["remaining"] >= 0,
+        "overBudget": response["remaining"] < 0,
+        "issues": issues
+    })
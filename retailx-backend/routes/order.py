@@ -1,66 +1,66 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import mongo
 from models.order_model import Order
-from models.user_model import User
-import os
-import stripe
-from datetime import datetime
+from repositories.order_ingestion import enqueue_finalize
 
 orders_bp = Blueprint("orders", __name__, url_prefix="/api/orders")
 
+# Payment confirmation ab sirf Stripe webhook (routes/stripe_webhook.py) se aata hai.
+# Client yahan sirf items/address bhejta hai aur phir status poll karta hai;
+# request path mein koi Stripe network call nahi hota.
+
 @orders_bp.route("/create", methods=["POST"])
 @jwt_required()
 def create_order():
     try:
         email = get_jwt_identity()
-        data = request.get_json()
+        data = request.get_json() or {}
 
         session_id = data.get("session_id")
-        address = data.get("address")
-        items = data.get("items")
-        total = data.get("total")
+        address = data.get("address") or {}
+        items = data.get("items") or []
 
-        if not session_id:
+        if not session_id or not isinstance(session_id, str):
             return jsonify({"error": "No session ID provided"}), 400
 
-        # Initialize Stripe
-        stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-
-        # Retrieve session to verify it exists and get Payment Intent ID
-        session = stripe.checkout.Session.retrieve(session_id)
-        payment_id = session.payment_intent 
+        try:
+            total = float(data.get("total"))
+        except (TypeError, ValueError):
+            return jsonify({"error": "total must be a number"}), 400
 
-        # Prevent duplicate orders for the same payment
-        existing_order = mongo.db.orders.find_one({"payment_id": payment_id})
-        if existing_order:
-            return jsonify({"message": "Order already recorded", "order_id": str(existing_order["_id"])}), 200
+        # Same session_id dobara aaye toh wahi order update hota hai (duplicate nahi banta)
+        order = Order.record_intent(session_id, email, items, total, address)
+        if order is None:
+            return jsonify({"error": "Session belongs to another account"}), 409
 
-        # Save order to DB
-        result = Order.create_order(
-            email=email,
-            items=items,
-            total=float(total),
-            address_details=address,
-            payment_id=payment_id,
-            created_at=datetime.utcnow()
-        )
-
-        # Update user's profile with latest contact/address
-        User.save_contact_and_address(
-            email=email,
-            contact={
-                "email": address.get("email"),
-                "phone": address.get("phone")
-            },
-            address=address
-        )
+        # Webhook pehle aa chuka ho toh worker abhi finalize kar dega
+        enqueue_finalize(session_id)
 
         return jsonify({
-            "message": "Order saved successfully",
-            "order_id": str(result.inserted_id)
-        }), 201
+            "message": "Order received",
+            "status": order.get("status"),
+            "order_id": str(order["_id"])
+        }), 202
 
     except Exception as e:
         print(f"Backend Error: {str(e)}") # Critical for debugging
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+# GET /api/orders/status/<session_id>  ->  pending | paid | expired | failed
+@orders_bp.route("/status/<session_id>", methods=["GET"])
+@jwt_required()
+def order_status(session_id):
+    order = Order.find_status(session_id)
+    # Dusre user ka order (ya abhi sirf webhook wala, bina owner) -> 404
+    if not order or order.get("email") != get_jwt_identity():
+        return jsonify({"error": "Order not found"}), 404
+
+    return jsonify({
+        "order_id": str(order["_id"]),
+        "status": order.get("status"),
+        "payment_id": order.get("payment_id"),
+        "total": order.get("total"),
+        "created_at": order.get("created_at"),
+        "paid_at": order.get("paid_at")
+    })
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
-from repositories.products_repository import get_products_by_search, get_products_by_category, get_all_products
+from repositories.products_repository import get_products_by_search, get_products_by_category, list_products
+from repositories.pagination import paginated_response, page_size, InvalidCursor
 
 product_routes = Blueprint("product_routes", __name__, url_prefix="/api/products")
 
@@ -9,22 +10,26 @@ def get_products():
         # 1. Get parameters from the URL
         query = request.args.get('q')
         category = request.args.get('category')
+        sort = request.args.get('sort')
+        limit = page_size(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        fields = request.args.get('fields')  # card | detail | full
 
         # 2. Logic: If there is a search query (?q=toys)
         if query:
             print(f"DEBUG: Searching for query: {query}")
-            products = get_products_by_search(query)
-            return jsonify(products), 200
+            return paginated_response(*get_products_by_search(query, sort=sort or "relevance", limit=limit, cursor=cursor, fields=fields)), 200
 
         # 3. Logic: If there is a category filter (?category=Toys)
         if category:
             print(f"DEBUG: Filtering by category: {category}")
-            products = get_products_by_category(category)
-            return jsonify(products), 200
+            return paginated_response(*get_products_by_category(category, sort, limit, cursor, fields)), 200
 
-        # 4. Default: Return everything if no params
-        return jsonify(get_all_products()), 200
+        # 4. Default: Saare products, page by page
+        return paginated_response(*list_products(sort=sort, limit=limit, cursor=cursor, fields=fields)), 200
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"SERVER ERROR: {e}")
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
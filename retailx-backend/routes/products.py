@@ -1,34 +1,83 @@
 from flask import Blueprint, jsonify, request
 from bson import ObjectId
 
-from repositories.products_repository import format_product
+from repositories.products_repository import (
+    format_product, list_products, get_products_by_ids, resolve_profile, DEFAULT_PROFILE, MAX_BATCH_IDS
+)
+from repositories.pagination import paginated_response, page_size, resolve_sort, InvalidCursor, DEFAULT_SORT
 from extensions import mongo
+from models.indexes import category_key
+from repositories.query_cache import cached_listing
+from repositories.result_cache import all_cache_stats
+from repositories.http_cache import (
+    VALIDATOR_FIELDS, product_validators, catalog_validators, is_not_modified,
+    not_modified_response, with_cache_headers
+)
+from repositories.catalog_events import current_catalog_state
 
 product_bp = Blueprint('product_bp', __name__)
 
+# ✅ Batch lookup (cart / wishlist / order history ek request mein)
+# GET  /api/products/batch?ids=<id1>,<id2>&fields=card
+# POST /api/products/batch  {"ids": [...], "fields": "card"}
+@product_bp.route("/batch", methods=["GET", "POST"])
+def get_products_batch():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        ids = data.get("ids") or []
+        fields = data.get("fields", DEFAULT_PROFILE)
+    else:
+        ids = [i.strip() for i in request.args.get("ids", "").split(",") if i.strip()]
+        fields = request.args.get("fields", DEFAULT_PROFILE)
+
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids required"}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+    if not isinstance(fields, str):
+        return jsonify({"error": "fields must be a profile name (card | detail | full)"}), 400
+
+    return jsonify(get_products_by_ids(ids, fields)), 200
+
+
 # ✅ Get Single Product
 @product_bp.route("/<id>", methods=["GET"])
 def get_single_product(id):
     try:
-        product = mongo.db.products.find_one({"_id": ObjectId(id)})
-        if product:
-            return jsonify(format_product(product))
-        return jsonify({"error": "Product not found"}), 404
+        product_id = ObjectId(id)
     except Exception:
         return jsonify({"error": "Invalid ID format"}), 400
 
+    # Client ke paas version hai toh pehle sirf validator fields padho (chhota read)
+    if request.if_none_match or request.if_modified_since:
+        meta = mongo.db.products.find_one({"_id": product_id}, VALIDATOR_FIELDS)
+        if not meta:
+            return jsonify({"error": "Product not found"}), 404
+        validators = product_validators(meta)
+        if is_not_modified(*validators):
+            return not_modified_response(*validators)
+
+    product = mongo.db.products.find_one({"_id": product_id})
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    return with_cache_headers(jsonify(format_product(product)), *product_validators(product))
+
 
-# ✅ Get Products (category / exclude / limit)
+# ✅ Get Products (category / exclude / limit / sort / cursor / fields)
+# Response body list hi hai; agla page `X-Next-Cursor` header se milta hai
 @product_bp.route("/", methods=["GET"])
 def get_products():
     category_name = request.args.get('category')
-    limit = int(request.args.get('limit', 20))
+    limit = page_size(request.args.get('limit'), default=20)
     exclude_id = request.args.get('exclude')
+    sort = request.args.get('sort', DEFAULT_SORT)
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields', DEFAULT_PROFILE)  # card | detail | full
 
     query = {}
 
     if category_name:
-        query["category"] = {"$regex": f"^{category_name}$", "$options": "i"}
+        query["categoryKey"] = category_key(category_name)
 
     if exclude_id:
         try:
@@ -36,8 +85,24 @@ def get_products():
         except Exception:
             pass
 
-    products = list(
-        mongo.db.products.find(query).limit(limit)
-    )
+    # Ek hi version se ETag aur cache key dono (purana page naye ETag ke saath na jaaye)
+    state = current_catalog_state()
+    validators = catalog_validators("products", state)
+    if is_not_modified(*validators):
+        return not_modified_response(*validators)
+
+    try:
+        params = (resolve_sort(sort), limit, cursor, resolve_profile(fields), exclude_id)
+        products, next_cursor = cached_listing(
+            params, category_name, lambda: list_products(query, sort, limit, cursor, fields), state[0]
+        )
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    return with_cache_headers(paginated_response(products, next_cursor), *validators)
+
 
-    return jsonify([format_product(p) for p in products])
\ No newline at end of file
+# Cache hit/miss counters (sizing ke liye): GET /api/products/cache/stats
+@product_bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(all_cache_stats())
@@ -1,15 +1,56 @@
+import os
 from flask import Blueprint, request, jsonify
-from repositories.recommendation_repository import get_recommendations, get_preference_recommendations
-import random
-from repositories.products_repository import get_all_products
+from repositories.recommendation_repository import (
+    get_similar_products, get_preference_recommendations, get_catalog_snapshot, sample_catalog,
+    get_recommendations_batch
+)
+from repositories.synergy_repository import get_synergy_picks
+from repositories.result_cache import ResultCache
+from repositories.catalog_events import on_catalog_change
+from repositories.pagination import parse_limit, page_size
 
 recommendation_bp = Blueprint('recommendations', __name__)
 
+# Mind reader + synergy (expensive, deterministic) ka result per key cache hota hai.
+# Random buckets har request pe snapshot se naye sample hote hain, taaki rotate karte rahein.
+feed_cache = ResultCache(
+    "feed",
+    max_size=int(os.getenv("FEED_CACHE_SIZE", 5000)),
+    ttl=int(os.getenv("FEED_CACHE_TTL", 120)),
+    stale_ttl=int(os.getenv("FEED_CACHE_STALE_TTL", 600))
+)
+
+
+@on_catalog_change
+def _expire_feed_cache(event):
+    feed_cache.expire_all()
+
+
+def build_personal_buckets(last_viewed, cart_ids):
+    snapshot = get_catalog_snapshot()
+    exclude_ids = set()
+    buckets = {"mind_reader": [], "synergy_picks": []}
+
+    # --- SECTION 1: MIND READER ---
+    if last_viewed:
+        # Similarity based products
+        buckets["mind_reader"] = get_similar_products(last_viewed, top_n=6, snapshot=snapshot)
+        for p in buckets["mind_reader"]: exclude_ids.add(p['id'])
+
+    # --- SECTION 2: SYNERGY PICKS ---
+    # Last viewed + cart items ke saath jo sabse zyada saath mein kharide gaye
+    basket = list(cart_ids) + ([last_viewed] if last_viewed else [])
+    if basket:
+        buckets["synergy_picks"] = get_synergy_picks(basket, k=6, exclude_ids=exclude_ids, snapshot=snapshot)
+
+    return buckets
+
 
 @recommendation_bp.route('/feed', methods=['GET'])
 def get_home_feed():
     prefs_raw = request.args.get('prefs', '')
     last_viewed = request.args.get('last_viewed')
+    cart_ids = [c.strip() for c in request.args.get('cart', '').split(',') if c.strip()]
     user_prefs = [p.strip().lower() for p in prefs_raw.split(',') if p]
 
     # Data Buckets initialization
@@ -20,36 +61,66 @@ def get_home_feed():
         "discovery_radar": []     # Random/Trending
     }
 
-    exclude_ids = set() # Duplicates handle karne ke liye
+    if last_viewed == "null":
+        last_viewed = None
+    cache_key = (last_viewed, tuple(sorted(set(cart_ids))))
+    response_data.update(feed_cache.get_or_compute(
+        cache_key, lambda: build_personal_buckets(last_viewed, cache_key[1])
+    ))
 
-    # --- SECTION 1: MIND READER ---
-    if last_viewed and last_viewed != "null":
-        # Similarity based products
-        sim_products = get_recommendations(last_viewed, top_n=6)
-        response_data["mind_reader"] = sim_products
-        for p in sim_products: exclude_ids.add(p['id'])
-
-    # --- SECTION 2: SIGNATURE STYLES ---
-    pref_products = get_preference_recommendations(user_prefs)
-    # Sirf wahi jo Mind Reader mein nahi hain
-    filtered_prefs = [p for p in pref_products if p['id'] not in exclude_ids]
-    random.shuffle(filtered_prefs)
-    response_data["signature_styles"] = filtered_prefs[:8]
+    # Duplicates handle karne ke liye
+    exclude_ids = {p['id'] for bucket in response_data.values() for p in bucket}
+
+    # Random buckets isi ek catalog snapshot se (koi bucket dobara scan nahi karta)
+    snapshot = get_catalog_snapshot()
+
+    # --- SECTION 3: SIGNATURE STYLES ---
+    # Sirf wahi jo upar ke buckets mein nahi hain
+    response_data["signature_styles"] = get_preference_recommendations(
+        user_prefs, k=8, exclude_ids=exclude_ids, snapshot=snapshot
+    )
     for p in response_data["signature_styles"]: exclude_ids.add(p['id'])
 
-    # --- SECTION 3: DISCOVERY RADAR ---
-    all_prods = get_all_products()
-    remaining = [p for p in all_prods if p['id'] not in exclude_ids]
-    if remaining:
-        response_data["discovery_radar"] = random.sample(remaining, min(len(remaining), 10))
+    # --- SECTION 4: DISCOVERY RADAR ---
+    response_data["discovery_radar"] = sample_catalog(10, exclude_ids, snapshot)
 
     return jsonify(response_data), 200
 
 
+# Cart page ke liye "Frequently bought together" (ek lookup)
+# GET /api/recommendations/synergy?ids=<id1>,<id2>&limit=6
+@recommendation_bp.route('/synergy', methods=['GET'])
+def get_synergy_items():
+    ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+    limit = page_size(request.args.get('limit'), default=6, maximum=24)
+    return jsonify(get_synergy_picks(ids, k=limit)), 200
 
 
 # 2. Individual Product Page ke liye (TF-IDF trigger)
 @recommendation_bp.route('/api/recommendations/similar/<product_id>', methods=['GET'])
 def get_similar_items(product_id):
-    similar_products = get_recommendations(product_id)
-    return jsonify(similar_products), 200
\ No newline at end of file
+    similar_products = get_similar_products(product_id)
+    return jsonify(similar_products), 200
+
+
+# Cart / Checkout: kai products ke similar items ek hi call mein
+# POST /api/recommendations/similar/batch  {"ids": [...], "top_n": 4}
+# GET  /api/recommendations/similar/batch?ids=<id1>,<id2>&top_n=4
+@recommendation_bp.route('/similar/batch', methods=['GET', 'POST'])
+def get_similar_items_batch():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids') or []
+        top_n = data.get('top_n', 4)
+    else:
+        ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+        top_n = request.args.get('top_n', 4)
+
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids required"}), 400
+
+    try:
+        top_n = parse_limit(top_n, default=4, maximum=12)
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n must be a number"}), 400
+    return jsonify(get_recommendations_batch(ids, top_n=top_n)), 200
@@ -1,8 +1,16 @@
 from flask import Blueprint, jsonify, request
 
 # ✅ Correct imports
-from extensions import mongo
-from repositories.products_repository import format_product
+from repositories.products_repository import (
+    get_products_by_search, get_products_by_category, search_with_facets, category_with_facets,
+    search_sort, apply_profile, resolve_profile, DEFAULT_PROFILE
+)
+from repositories.suggest_index import get_suggest_index
+from repositories.fuzzy_index import get_fuzzy_index
+from repositories.pagination import paginated_response, page_size, resolve_sort, InvalidCursor
+from repositories.query_cache import cached_search
+from repositories.http_cache import catalog_validators, is_not_modified, not_modified_response, with_cache_headers
+from repositories.catalog_events import current_catalog_state
 
 search_bp = Blueprint('search_bp', __name__)
 
@@ -11,22 +19,83 @@ def search_products():
     query = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
 
+    # facets=1 -> body {items, facets, next} (brand / category / price counts)
+    with_facets = request.args.get('facets', '').lower() in ("1", "true")
+
     # Agar dono khali hain toh empty list
     if not query and not category:
-        return jsonify([])
+        return jsonify({"items": [], "facets": {}, "next": None}) if with_facets else jsonify([])
+
+    # mode=text  -> sirf text index (exact words)
+    # mode=fuzzy -> sirf trigram index (typos: "sneekers", "playstaion")
+    # mode=auto  -> text, aur kuch na mile tab fuzzy (default)
+    mode = request.args.get('mode', 'auto').strip().lower()
+
+    # Pagination: sort=relevance|newest|price_asc|price_desc|rating, limit, cursor
+    sort = request.args.get('sort', 'relevance' if query else 'newest')
+    limit = page_size(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields', DEFAULT_PROFILE)  # card | detail | full
+
+    # Catalog nahi badla toh client ka copy hi current hai
+    state = current_catalog_state()
+    validators = catalog_validators("search", state)
+    if is_not_modified(*validators):
+        return not_modified_response(*validators)
+
+    params = (mode, search_sort(sort)[0] if query else resolve_sort(sort), limit, cursor, resolve_profile(fields))
+    try:
+        if with_facets:
+            results, next_cursor, facets = cached_search(
+                params, query, category, lambda: faceted_search(query, category or None, mode, sort, limit, cursor, fields),
+                state[0], facets=True
+            )
+            response = paginated_response({"items": results, "facets": facets, "next": next_cursor}, next_cursor)
+        else:
+            response = paginated_response(*cached_search(
+                params, query, category, lambda: run_search(query, category or None, mode, sort, limit, cursor, fields),
+                state[0]
+            ))
+        return with_cache_headers(response, *validators)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
 
-    # Filter build karein
-    filters = []
-    if query:
-        filters.append({"name": {"$regex": query, "$options": "i"}})
-        filters.append({"brand": {"$regex": query, "$options": "i"}})
-        filters.append({"tags": {"$regex": query, "$options": "i"}})
-    
-    if category:
-        filters.append({"category": {"$regex": category, "$options": "i"}})
-
-    search_filter = {"$or": filters}
-
-    products = list(mongo.db.products.find(search_filter))
-    result = [format_product(p) for p in products]
-    return jsonify(result)
\ No newline at end of file
+def run_search(query, category, mode, sort, limit, cursor, fields):
+    """Return: (products, next_cursor)"""
+    if not query:
+        return get_products_by_category(category, sort, limit, cursor, fields)
+
+    # Text index se relevance-ranked results (category ho toh filter ki tarah)
+    results, next_cursor = [], None
+    if mode != "fuzzy":
+        results, next_cursor = get_products_by_search(query, category, sort, limit, cursor, fields)
+    if not results and not cursor and mode in ("fuzzy", "auto"):
+        # Fuzzy results in-memory hain aur ek hi (bounded) page mein aate hain
+        results = [apply_profile(p, fields) for p in get_fuzzy_index().search(query, category, limit)]
+    return results, next_cursor
+
+
+def faceted_search(query, category, mode, sort, limit, cursor, fields):
+    """Hits + facets ek hi aggregation se (fuzzy mode mein in-memory index se).
+    Return: (products, next_cursor, facets)"""
+    if not query:
+        return category_with_facets(category, sort, limit, cursor, fields)
+
+    results, next_cursor, facets = [], None, {}
+    if mode != "fuzzy":
+        results, next_cursor, facets = search_with_facets(query, category, sort, limit, cursor, fields)
+    if not results and not cursor and mode in ("fuzzy", "auto"):
+        fuzzy_results, facets = get_fuzzy_index().search_with_facets(query, category, limit)
+        results = [apply_profile(p, fields) for p in fuzzy_results]
+    return results, next_cursor, facets
+
+
+# Type-ahead: GET /api/search/suggest?q=nik&limit=8
+@search_bp.route("/suggest", methods=["GET"])
+def suggest():
+    prefix = request.args.get('q', '').strip()
+    limit = page_size(request.args.get('limit'), default=8, maximum=20)
+    if not prefix:
+        return jsonify([])
+    return jsonify(get_suggest_index().suggest(prefix, limit))
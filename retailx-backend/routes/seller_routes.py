@@ -3,8 +3,12 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from extensions import mongo, bcrypt
 from models.seller_model import Seller 
+from models.indexes import category_key
+from repositories.catalog_events import notify_catalog_change
+from repositories.pagination import paginate_find, paginated_response, page_size, InvalidCursor, MAX_PAGE_SIZE
 from flask_cors import cross_origin
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 seller_bp = Blueprint("seller", __name__)
 
@@ -79,11 +83,19 @@ def login_seller():
 def get_inventory():
     try:
         current_seller_email = get_jwt_identity()
-        # Sirf wahi products dikhao jo is logged-in seller ke hain
-        products = list(mongo.db.products.find({"seller_email": current_seller_email}))
+        # Sirf wahi products dikhao jo is logged-in seller ke hain (page by page)
+        products, next_cursor = paginate_find(
+            mongo.db.products,
+            {"seller_email": current_seller_email},
+            request.args.get("sort"),
+            page_size(request.args.get("limit"), default=MAX_PAGE_SIZE),
+            request.args.get("cursor")
+        )
         for p in products:
             p["_id"] = str(p["_id"])
-        return jsonify(products), 200
+        return paginated_response(products, next_cursor), 200
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"Server Error: {str(e)}"}), 500
 
@@ -132,16 +144,20 @@ def add_product():
             "imageURL": data.get('imageURL', ""),
             "description": data.get('description', ""),
             "category": data.get('category', "Other"),
+            "categoryKey": category_key(data.get('category', "Other")),  # category pages ka index lookup
             "subCategory": data.get('subCategory', ""),
             "seller_email": seller_email, # Isse connect hota hai product seller se
             "isActive": True,
             "tags": tags_list,
             "highlights": data.get('highlights', []), # Expecting Array from frontend
             "specs": data.get('specs', {}),           # Expecting Object from frontend
-            "createdAt":datetime.utcnow() # Better to use datetime.utcnow()
+            "createdAt":datetime.utcnow(), # Better to use datetime.utcnow()
+            "rev": 1  # har seller write pe +1 (ETag isi se banta hai)
         }
+        new_product["updatedAt"] = new_product["createdAt"]
         
         result = mongo.db.products.insert_one(new_product)
+        notify_catalog_change("add", result.inserted_id, after=new_product)
         return jsonify({"message": "Product Live ho gaya!", "id": str(result.inserted_id)}), 201
     except Exception as e:
         return jsonify({"message": str(e)}), 500
@@ -171,6 +187,7 @@ def update_product(id):
             "name": data.get('name'),
             "description": data.get('description'),
             "category": data.get('category'),
+            "categoryKey": category_key(data.get('category')),
             "subCategory": data.get('subCategory'),
             "brand": data.get('brand'),
             "price": price,
@@ -180,19 +197,24 @@ def update_product(id):
             "imageURL": data.get('imageURL'),
             "tags": tags_list,
             "highlights": data.get('highlights', []),
-            "specs": data.get('specs', {})
-
+            "specs": data.get('specs', {}),
+            "updatedAt": datetime.utcnow()
         }
         
-        # Product ID se dhoond kar update karo
-        result = mongo.db.products.update_one(
-            {"_id": ObjectId(id)}, 
-            {"$set": update_data}
+        # Product ID se dhoond kar update karo. Purane values (sirf badle fields)
+        # saath mein milte hain taaki caches sirf affected results hi hatayein
+        before = mongo.db.products.find_one_and_update(
+            {"_id": ObjectId(id)},
+            {"$set": update_data, "$inc": {"rev": 1}},
+            projection={field: 1 for field in update_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if before is None:
             return jsonify({"message": "Product nahi mila"}), 404
 
+        notify_catalog_change("update", id, before=before, after=update_data)
+
         return jsonify({"message": "Product details updated successfully"}), 200
     except Exception as e:
         return jsonify({"message": str(e)}), 500
@@ -204,10 +226,13 @@ def update_product(id):
 @cross_origin()
 def delete_product(id):
     try:
-        result = mongo.db.products.delete_one({"_id": ObjectId(id)})
-        if result.deleted_count == 0:
+        before = mongo.db.products.find_one_and_delete(
+            {"_id": ObjectId(id)}, projection={"category": 1, "categoryKey": 1}
+        )
+        if before is None:
             return jsonify({"message": "Product already deleted or not found"}), 404
-            
+
+        notify_catalog_change("delete", id, before=before)
         return jsonify({"message": "Product removed from market"}), 200
     except Exception as e:
         return jsonify({"message": str(e)}), 500
@@ -220,10 +245,17 @@ def delete_product(id):
 def update_stock(id):
     try:
         new_stock = request.json.get('stock')
-        mongo.db.products.update_one(
+        update_data = {"stock": int(new_stock), "updatedAt": datetime.utcnow()}
+        before = mongo.db.products.find_one_and_update(
             {"_id": ObjectId(id)}, 
-            {"$set": {"stock": int(new_stock)}}
+            {"$set": update_data, "$inc": {"rev": 1}},
+            projection={"stock": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if before is None:
+            return jsonify({"message": "Product nahi mila"}), 404
+
+        notify_catalog_change("stock", id, before=before, after=update_data)
         return jsonify({"message": "Stock updated"}), 200
     except Exception as e:
         return jsonify({"message": str(e)}), 500
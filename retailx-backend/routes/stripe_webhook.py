@@ -1,23 +1,65 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, jsonify
+import json
 import stripe
 import os
 
+from repositories.order_ingestion import record_paid_session, close_session
+
 webhook_bp = Blueprint("webhook", __name__, url_prefix="/api/webhook")
 
+# Local development: STRIPE_WEBHOOK_ALLOW_UNSIGNED=1 pe bina signature ke events
+# (stripe_event_stub.py se) bhi accept hote hain. Production mein kabhi on mat karna.
+def allow_unsigned():
+    return os.getenv("STRIPE_WEBHOOK_ALLOW_UNSIGNED", "0") == "1"
+
+
+def parse_event(payload, sig_header):
+    """Signature verify karke event ko plain dict mein parse karo."""
+    secret = os.getenv("STRIPE_WEBHOOK_SECRET")
+    if sig_header and secret:
+        # tolerance se purane (replayed) signed events reject hote hain (Stripe ka 300s window)
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, secret, tolerance=stripe.Webhook.DEFAULT_TOLERANCE
+        )
+    elif not allow_unsigned():
+        raise ValueError("Missing Stripe signature")
+    return json.loads(payload)
+
+
 @webhook_bp.route("/stripe", methods=["POST"])
 def stripe_webhook():
-    payload = request.data
+    payload = request.get_data()
     sig_header = request.headers.get("Stripe-Signature")
 
-    event = stripe.Webhook.construct_event(
-        payload,
-        sig_header,
-        os.getenv("STRIPE_WEBHOOK_SECRET")
-    )
+    try:
+        event = parse_event(payload, sig_header)
+    except Exception as e:
+        # Invalid payload / signature: Stripe ko 400 (retry nahi karna)
+        print(f"Webhook rejected: {e}")
+        return jsonify({"error": "Invalid webhook"}), 400
+
+    event_type = event["type"]
+    session = event["data"]["object"]
+    if event_type == "checkout.session.completed" and session.get("payment_status", "paid") != "paid":
+        # Delayed payment methods: async_payment_succeeded pe aayega
+        return "", 200
 
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
+    if event_type in ("checkout.session.completed", "checkout.session.async_payment_succeeded"):
+        try:
+            # Ack se pehle paid state DB mein (ek idempotent upsert); fail hua toh Stripe retry karega
+            if not record_paid_session(session):
+                print(f"Order queue full, finalize sweep pe chalega: {session['id']}")
+        except Exception as e:
+            print(f"Webhook order write failed: {e}")
+            return jsonify({"error": "Order write failed"}), 500
         print("✅ PAYMENT VERIFIED:", session["id"])
-        
+
+    elif event_type in ("checkout.session.expired", "checkout.session.async_payment_failed"):
+        status = "expired" if event_type == "checkout.session.expired" else "failed"
+        try:
+            close_session(session, status, event_type.rsplit(".", 1)[-1])
+        except Exception as e:
+            print(f"Webhook order write failed: {e}")
+            return jsonify({"error": "Order write failed"}), 500
 
     return "", 200
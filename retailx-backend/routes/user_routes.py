@@ -15,7 +15,9 @@ def dashboard_data():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    orders = list(mongo.db.orders.find({"email": email}).sort("created_at", -1))
+    # Sirf confirmed orders: /api/orders/create payment se pehle hi pending intent
+    # bana deta hai, wo history aur "total spent" mein nahi aane chahiye
+    orders = list(mongo.db.orders.find({"email": email, "status": "paid"}).sort("created_at", -1))
 
     user["_id"] = str(user["_id"])
     for order in orders:
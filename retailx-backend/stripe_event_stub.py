@@ -0,0 +1,85 @@
+"""Local Stripe webhook stub.
+
+Bina Stripe CLI ke `checkout.session.completed` event /api/webhook/stripe pe
+bhejta hai, taaki order ingestion locally test ho sake.
+
+STRIPE_WEBHOOK_SECRET set hai toh event Stripe jaisa sign hota hai
+(Stripe-Signature: t=<ts>,v1=<hmac>). Nahi hai toh unsigned jaata hai - uske liye
+server pe STRIPE_WEBHOOK_ALLOW_UNSIGNED=1 chahiye.
+
+Usage:
+    python stripe_event_stub.py --session-id cs_test_123 --amount 499 --email user@example.com
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from dotenv import load_dotenv
+
+
+def build_event(session_id, payment_intent, amount, email):
+    return {
+        "id": f"evt_stub_{uuid.uuid4().hex[:16]}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "created": int(time.time()),
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_intent": payment_intent,
+                "payment_status": "paid",
+                "amount_total": int(round(amount * 100)),  # Stripe paise mein bhejta hai
+                "currency": "inr",
+                "customer_details": {"email": email},
+            }
+        },
+    }
+
+
+def sign(payload, secret, timestamp=None):
+    timestamp = timestamp or int(time.time())
+    signed = f"{timestamp}.{payload}".encode("utf-8")
+    signature = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def send(url, event, secret=None):
+    payload = json.dumps(event)
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["Stripe-Signature"] = sign(payload, secret)
+    request = urllib.request.Request(url, data=payload.encode("utf-8"), headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Send a fake checkout.session.completed event to the local webhook")
+    parser.add_argument("--session-id", default=f"cs_test_{uuid.uuid4().hex[:12]}")
+    parser.add_argument("--payment-intent", help="default: pi_<session id>")
+    parser.add_argument("--amount", type=float, default=0, help="order total (rupees)")
+    parser.add_argument("--email", default="user@example.com")
+    parser.add_argument("--url", default="http://localhost:5000/api/webhook/stripe")
+    args = parser.parse_args()
+
+    event = build_event(
+        args.session_id,
+        args.payment_intent or f"pi_{args.session_id}",
+        args.amount,
+        args.email
+    )
+    status, body = send(args.url, event, os.getenv("STRIPE_WEBHOOK_SECRET"))
+    print(f"{status} {body or ''}".strip())
+    print(f"session_id: {args.session_id}")